@@ -0,0 +1,354 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from datasets import SHAPES, dataset_seed, generate, make_rng
+from external import RUN_LENGTH, ExternalSort
+from searching import rate_label
+from sorting import (ALGORITHMS, PARALLEL_ALGORITHMS, PARALLEL_WORKERS, STEP_NAMES, STEP_COMPARE, STEP_SWAP,
+                        STEP_WRITE, Instrumentation, ResultCache, result_key, start_sort)
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000, 1000000]
+SPEEDUP_SIZES = [100000, 1000000]
+EXTERNAL_SIZES = [100000, 1000000]
+# Input shapes swept when --shapes isn't given. The others in datasets.SHAPES are there to ask for: zipf, and
+# quicksort-killer, which takes a run of Introsort to build.
+DEFAULT_SHAPES = ["random", "sorted", "reversed", "few-unique", "nearly-sorted", "organ-pipe"]
+# Run sorts for --external when --algorithms isn't given; the quadratic ones take hours on full runs.
+EXTERNAL_ALGORITHMS = ["Timsort", "Introsort", "LSD Radix Sort"]
+
+FIELDS = ["algorithm", "shape", "ascending", "n", "status", "seconds", "comparisons", "swaps", "writes",
+          "steps", "ns_per_step", "peak_bytes", "max_depth", "cache"]
+
+SPEEDUP_FIELDS = ["algorithm", "n", "workers", "status", "seconds", "speedup"]
+
+EXTERNAL_FIELDS = ["algorithm", "n", "run_length", "runs", "passes", "status", "seconds", "bytes_per_second",
+                   "peak_rss"]
+
+
+# Drains a sorting generator, counting steps by kind. Stops early once the deadline passes.
+def consume(generator, deadline):
+    counts = [0] * len(STEP_NAMES)
+    steps = 0
+    for step in generator:
+        counts[step[0]] += 1
+        steps += 1
+        if not steps & 0xFFF and time.perf_counter() > deadline:
+            return counts, False
+    return counts, True
+
+
+# With a cache, a run already in it is answered from there: seconds is then the lookup time and the
+# counts are those of the stored run.
+def run_one(algorithm, data, ascending, time_limit, measure_memory, cache=None):
+    row = {"status": "ok", "seconds": None, "comparisons": None, "swaps": None, "writes": None, "steps": None,
+           "ns_per_step": None, "peak_bytes": None, "max_depth": None, "cache": None}
+    if cache is not None:
+        start = time.perf_counter()
+        key = result_key(data, algorithm.name, ascending)
+        entry = cache.get(key)
+        if entry is not None:
+            row.update(seconds=time.perf_counter() - start, comparisons=entry.counts[STEP_COMPARE],
+                       swaps=entry.counts[STEP_SWAP], writes=entry.counts[STEP_WRITE], steps=sum(entry.counts),
+                       max_depth=entry.max_depth, cache="hit")
+            return row
+        row["cache"] = "miss"
+    lst = list(data)
+    start = time.perf_counter()
+    try:
+        counts, finished = consume(start_sort(algorithm, lst, ascending), start + time_limit)
+    except RecursionError:
+        row["status"] = "recursion"
+        return row
+    row["seconds"] = time.perf_counter() - start
+    if not finished:
+        row["status"] = "timeout"
+        return row
+    if lst != sorted(data, reverse=not ascending):
+        row["status"] = "wrong"
+    final = lst
+
+    row["comparisons"] = counts[STEP_COMPARE]
+    row["swaps"] = counts[STEP_SWAP]
+    row["writes"] = counts[STEP_WRITE]
+    row["steps"] = sum(counts)
+    # Wall time per step yielded, which stays flat across sizes unless steps get dearer as generators nest deeper.
+    row["ns_per_step"] = round(row["seconds"] * 1e9 / row["steps"]) if row["steps"] else None
+
+    # Memory and generator depth are measured in a second run so tracemalloc and the instrumentation
+    # don't skew the timing above. The input copy is made before tracing starts, so this is the sort's
+    # auxiliary memory.
+    if measure_memory:
+        lst = list(data)
+        stats = Instrumentation(track_depth=True)
+        tracemalloc.start()
+        try:
+            consume(stats.wrap(start_sort(algorithm, lst, ascending)), time.perf_counter() + 4 * time_limit)
+            row["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        row["max_depth"] = stats.max_depth
+    if cache is not None and row["status"] == "ok":
+        cache.put(key, final, None, counts, row["max_depth"])
+    return row
+
+
+# Yields one result row per (algorithm, shape, direction, size) and repetition. Once a combination times out
+# or runs out of recursion depth, the larger sizes for it are reported as skipped instead of being run.
+def run_benchmark(algorithms, shapes, sizes, directions, time_limit=2.0, measure_memory=True, seed=0, repeat=1,
+                  cache=None):
+    gave_up = set()
+    for shape in shapes:
+        for n in sizes:
+            data = generate(shape, n, make_rng(dataset_seed(seed, shape, n)))
+            for name in algorithms:
+                for ascending in directions:
+                    for _ in range(repeat):
+                        key = (name, shape, ascending)
+                        row = {"algorithm": name, "shape": shape, "ascending": ascending, "n": n}
+                        if key in gave_up:
+                            row.update(status="skipped", seconds=None, comparisons=None, swaps=None, writes=None,
+                                       steps=None, ns_per_step=None, peak_bytes=None, max_depth=None, cache=None)
+                        else:
+                            row.update(run_one(ALGORITHMS[name], data, ascending, time_limit, measure_memory, cache))
+                            if row["status"] in ("timeout", "recursion"):
+                                gave_up.add(key)
+                        yield row
+
+
+# Times every parallel sort on the same random list with each worker count and reports its speedup
+# over the first (smallest) count, 1 worker by default, which runs in-process without a pool.
+def run_speedup(algorithms, sizes, worker_counts, seed=0):
+    for n in sizes:
+        data = generate("random", n, make_rng(dataset_seed(seed, "speedup", n)))
+        for name in algorithms:
+            baseline = None
+            for workers in worker_counts:
+                lst = list(data)
+                start = time.perf_counter()
+                consume(PARALLEL_ALGORITHMS[name].function(lst, True, workers), float("inf"))
+                seconds = time.perf_counter() - start
+                if baseline is None:
+                    baseline = seconds
+                yield {"algorithm": name, "n": n, "workers": workers,
+                       "status": "ok" if lst == sorted(data) else "wrong", "seconds": seconds,
+                       "speedup": baseline / seconds}
+
+
+# Highest resident set size of this process so far, in bytes, or None where the resource module is missing.
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # kilobytes everywhere else
+
+
+# Writes n random int64s to path a run at a time, so the benchmark itself never holds the whole file.
+def write_random_file(path, n, rng, chunk=RUN_LENGTH):
+    with open(path, "wb") as f:
+        for lo in range(0, n, chunk):
+            array('q', generate("random", min(chunk, n - lo), rng, 0, n)).tofile(f)
+
+
+# Whether path holds n int64s in ascending order, read a run at a time.
+def sorted_file(path, n, chunk=RUN_LENGTH):
+    previous = None
+    count = 0
+    with open(path, "rb") as f:
+        while True:
+            values = array('q', f.read(8 * chunk))
+            if not values:
+                return count == n
+            if previous is not None and previous > values[0]:
+                return False
+            if any(values[i] > values[i + 1] for i in range(len(values) - 1)):
+                return False
+            previous = values[-1]
+            count += len(values)
+
+
+# Yields one row per (algorithm, size) of external sorts of a random file written to a temporary directory.
+# bytes_per_second is the input size over the whole sort; peak_rss is this process's high-water mark so far,
+# which with the sizes run in increasing order is the footprint of the largest sort yet.
+def run_external(algorithms, sizes, run_length, time_limit=2.0, seed=0):
+    gave_up = set()
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "input.bin")
+        output = os.path.join(tmp, "output.bin")
+        for n in sizes:
+            write_random_file(source, n, make_rng(dataset_seed(seed, "external", n)))
+            for name in algorithms:
+                row = {"algorithm": name, "n": n, "run_length": run_length, "status": "skipped", "runs": None,
+                       "passes": None, "seconds": None, "bytes_per_second": None, "peak_rss": None}
+                if name in gave_up:
+                    yield row
+                    continue
+                external = ExternalSort(source, output, ALGORITHMS[name], True, run_length, tmp)
+                steps = external.steps()
+                start = time.perf_counter()
+                _, finished = consume(steps, start + time_limit)
+                seconds = time.perf_counter() - start
+                if not finished:
+                    steps.close()
+                    gave_up.add(name)
+                    row["status"] = "timeout"
+                    yield row
+                    continue
+                row.update(runs=external.run_count, passes=external.passes, seconds=seconds,
+                           bytes_per_second=8 * n / seconds, peak_rss=peak_rss(),
+                           status="ok" if sorted_file(output, n) else "wrong")
+                yield row
+
+
+def default_worker_counts():
+    counts = [1]
+    while counts[-1] * 2 < PARALLEL_WORKERS:
+        counts.append(counts[-1] * 2)
+    if PARALLEL_WORKERS > 1:
+        counts.append(PARALLEL_WORKERS)
+    return counts
+
+
+# The registry: every algorithm with its key, signature and complexity bounds.
+def list_algorithms():
+    print(f"{'algorithm':<22}{'key':<5}{'signature':<11}{'best':<20}{'average':<20}{'worst':<20}space")
+    for algorithm in ALGORITHMS.values():
+        best, average, worst, space = algorithm.complexity or ("?",) * 4
+        print(f"{algorithm.name:<22}{algorithm.key or '-':<5}{algorithm.signature:<11}{best:<20}{average:<20}"
+              f"{worst:<20}{space}")
+
+
+def format_row(row):
+    seconds = "-" if row["seconds"] is None else f"{row['seconds']:.4f}"
+    peak = "-" if row["peak_bytes"] is None else f"{row['peak_bytes'] / 1024:.1f}K"
+
+    def count(key):
+        return "-" if row[key] is None else str(row[key])
+
+    return (f"{row['algorithm']:<22}{row['shape']:<18}{'asc' if row['ascending'] else 'desc':<6}{row['n']:>9}"
+            f"  {row['status']:<10}{seconds:>10}{count('comparisons'):>14}{count('swaps'):>12}"
+            f"{count('writes'):>12}{count('ns_per_step'):>9}{peak:>12}{count('max_depth'):>7}  {row['cache'] or '-'}")
+
+
+def format_external_row(row):
+    seconds = "-" if row["seconds"] is None else f"{row['seconds']:.4f}"
+    rate = "-" if row["bytes_per_second"] is None else f"{rate_label(row['bytes_per_second'])}B"
+    peak = "-" if row["peak_rss"] is None else f"{row['peak_rss'] / (1024 * 1024):.1f}M"
+    return (f"{row['algorithm']:<22}{row['n']:>11}{row['run_length']:>9}{row['runs'] or '-':>6}"
+            f"{row['passes'] or '-':>8}  {row['status']:<10}{seconds:>10}{rate:>10}{peak:>10}")
+
+
+def format_speedup_row(row):
+    return (f"{row['algorithm']:<22}{row['n']:>9}{row['workers']:>9}  {row['status']:<8}{row['seconds']:>10.4f}"
+            f"{row['speedup']:>9.2f}x")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run the sorting algorithms headless and report their cost.")
+    parser.add_argument("--algorithms", nargs="+", choices=list(ALGORITHMS), metavar="NAME",
+                        help="algorithms to run (default: all, or a few fast ones with --external)")
+    parser.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=DEFAULT_SHAPES,
+                        help=f"input distributions (default: {', '.join(DEFAULT_SHAPES)})")
+    parser.add_argument("--sizes", nargs="+", type=int,
+                        help="list sizes to sweep (default: 10 to 1,000,000, or 100,000 and 1,000,000 with --speedup "
+                             "and --external)")
+    parser.add_argument("--direction", choices=["ascending", "descending", "both"], default="both")
+    parser.add_argument("--time-limit", type=float, default=2.0,
+                        help="seconds per run before giving up on larger sizes (default: 2)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the second run that measures peak memory and depth")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="run every combination this many times")
+    parser.add_argument("--cache", type=float, metavar="MB",
+                        help="memoize finished runs in an LRU cache of this many megabytes; repeats become hits")
+    parser.add_argument("--speedup", action="store_true",
+                        help="time the parallel sorts with each --workers count instead and report their speedup")
+    parser.add_argument("--workers", nargs="+", type=int, metavar="N",
+                        help=f"worker counts for --speedup (default: 1, 2, 4, ... up to {PARALLEL_WORKERS})")
+    parser.add_argument("--external", action="store_true",
+                        help="external merge sort a random file of each size instead; reports bytes/s and peak RSS")
+    parser.add_argument("--run-length", type=int, default=RUN_LENGTH,
+                        help=f"values sorted in memory per run with --external (default: {RUN_LENGTH})")
+    parser.add_argument("--list", action="store_true", help="list the registered algorithms and exit")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--csv", metavar="PATH", help="write results as CSV")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list:
+        list_algorithms()
+        return
+    if args.speedup:
+        speedup_main(args)
+        return
+    if args.external:
+        external_main(args)
+        return
+    directions = {"ascending": [True], "descending": [False], "both": [True, False]}[args.direction]
+
+    print(f"{'algorithm':<22}{'shape':<18}{'dir':<6}{'n':>9}  {'status':<10}{'seconds':>10}{'comparisons':>14}"
+          f"{'swaps':>12}{'writes':>12}{'ns/step':>9}{'peak mem':>12}{'depth':>7}  cache")
+    rows = []
+    sizes = sorted(args.sizes or DEFAULT_SIZES)
+    cache = None if args.cache is None else ResultCache(int(args.cache * 1024 * 1024))
+    for row in run_benchmark(args.algorithms or list(ALGORITHMS), args.shapes, sizes, directions, args.time_limit,
+                             not args.no_memory, args.seed, args.repeat, cache):
+        rows.append(row)
+        print(format_row(row), flush=True)
+    if cache is not None:
+        print(f"Result cache: {cache.hits} hits, {cache.misses} misses, {cache.evictions} evictions, "
+              f"{len(cache.entries)} runs in {cache.bytes / 1024:.1f}K")
+
+    save_rows(rows, FIELDS, args)
+
+
+def speedup_main(args):
+    algorithms = ([name for name in args.algorithms or () if name in PARALLEL_ALGORITHMS]
+                  or list(PARALLEL_ALGORITHMS))
+    sizes = sorted(args.sizes or SPEEDUP_SIZES)
+    print(f"{'algorithm':<22}{'n':>9}{'workers':>9}  {'status':<8}{'seconds':>10}{'speedup':>10}")
+    rows = []
+    for row in run_speedup(algorithms, sizes, args.workers or default_worker_counts(), args.seed):
+        rows.append(row)
+        print(format_speedup_row(row), flush=True)
+    save_rows(rows, SPEEDUP_FIELDS, args)
+
+
+def external_main(args):
+    sizes = sorted(args.sizes or EXTERNAL_SIZES)
+    print(f"{'algorithm':<22}{'n':>11}{'run len':>9}{'runs':>6}{'passes':>8}  {'status':<10}{'seconds':>10}"
+          f"{'bytes/s':>10}{'peak RSS':>10}")
+    rows = []
+    for row in run_external(args.algorithms or EXTERNAL_ALGORITHMS, sizes, args.run_length, args.time_limit,
+                            args.seed):
+        rows.append(row)
+        print(format_external_row(row), flush=True)
+    save_rows(rows, EXTERNAL_FIELDS, args)
+
+
+def save_rows(rows, fields, args):
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
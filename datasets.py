@@ -0,0 +1,225 @@
+import os
+import random
+import zlib
+from array import array
+
+from sorting import ALGORITHMS
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# A random source for the generators below: a NumPy Generator when NumPy is installed, else random.Random.
+# A seed gives the same data every time on the same kind of source; None picks a fresh one.
+def make_rng(seed=None):
+    if numpy is not None:
+        return numpy.random.default_rng(seed)
+    return random.Random(seed)
+
+
+# A seed made from any mix of values, e.g. dataset_seed(seed, shape, n), so every combination gets its own data.
+def dataset_seed(*parts):
+    return zlib.crc32("-".join(map(str, parts)).encode())
+
+
+def uniform(rng, low, high, n):
+    if numpy is not None:
+        return rng.integers(low, high, n, endpoint=True)
+    return [rng.randint(low, high) for _ in range(n)]
+
+
+def ordered(values, reverse=False):
+    if numpy is not None:
+        values = numpy.sort(values)
+        return values[::-1] if reverse else values
+    return sorted(values, reverse=reverse)
+
+
+# Ranks 0..n-1 spread evenly over low..high. A range narrower than the list makes neighbouring ranks equal.
+def spread(ranks, n, low, high):
+    steps = max(n - 1, 1)
+    if numpy is not None:
+        return low + numpy.asarray(ranks, dtype=numpy.int64) * (high - low) // steps
+    return [low + rank * (high - low) // steps for rank in ranks]
+
+
+# Generators take (n, rng, low, high) and return n values between low and high. Those that need no
+# randomness ignore rng, so their output is the same with or without a seed.
+def random_values(n, rng, low, high):
+    return uniform(rng, low, high, n)
+
+
+def sorted_values(n, rng, low, high):
+    return ordered(uniform(rng, low, high, n))
+
+
+def reversed_values(n, rng, low, high):
+    return ordered(uniform(rng, low, high, n), reverse=True)
+
+
+# Sorted, then k disjoint pairs of neighbours swapped: exactly k inversions when the values are distinct.
+# By default about 1% of the list is out of place.
+def nearly_sorted_values(n, rng, low, high, k=None):
+    values = ordered(uniform(rng, low, high, n))
+    pairs = n // 2
+    k = min(n // 100 + 1 if k is None else k, pairs)
+    if numpy is not None:
+        first = rng.choice(pairs, k, replace=False) * 2
+        values[first], values[first + 1] = values[first + 1], values[first].copy()
+        return values
+    for i in rng.sample(range(pairs), k):
+        values[2 * i], values[2 * i + 1] = values[2 * i + 1], values[2 * i]
+    return values
+
+
+# Only `unique` different values, spread evenly between low and high.
+def few_unique_values(n, rng, low, high, unique=10):
+    spacing = max((high - low) // max(unique - 1, 1), 1)
+    if numpy is not None:
+        return low + rng.integers(0, unique, n) * spacing
+    return [low + rng.randrange(unique) * spacing for _ in range(n)]
+
+
+# Zipf-distributed: the k-th smallest value is drawn with weight 1 / k**exponent, so low turns up most
+# often and the counts fall off in a long tail, as word or key frequencies do.
+def zipf_values(n, rng, low, high, exponent=1.2):
+    if numpy is not None:
+        weights = numpy.arange(1, high - low + 2, dtype=numpy.float64) ** -exponent
+        return low + rng.choice(len(weights), n, p=weights / weights.sum())
+    weights = [k ** -exponent for k in range(1, high - low + 2)]
+    return rng.choices(range(low, high + 1), weights, k=n)
+
+
+# Values that rise to the middle and fall back down, the ranks 0 2 4 ... 5 3 1 spread over low..high.
+def organ_pipe_values(n, rng, low, high):
+    if numpy is not None:
+        ranks = numpy.concatenate((numpy.arange(0, n, 2), numpy.arange(n - 1 - n % 2, 0, -2)))
+    else:
+        ranks = list(range(0, n, 2)) + list(range(n - 1 - n % 2, 0, -2))
+    return spread(ranks, n, low, high)
+
+
+class KillerAdversary:
+    """McIlroy's adversary for quicksort ("A Killer Adversary for Quicksort", 1999).
+
+    The sort runs on items whose order is only settled when they are compared. Items start out as "gas",
+    bigger than every settled value; when two gas items meet, one of them is frozen at the next smallest
+    value, preferring the one last compared with solid values, which is most likely the pivot. So the
+    pivots come out as small as possible, and the frozen values are an input that drives that sort to its
+    worst case however it picks them. Only comparison sorts can be run this way.
+    """
+
+    def __init__(self, n):
+        self.gas = n
+        self.values = [n] * n
+        self.solid = 0
+        self.candidate = 0
+
+    def compare(self, x, y):
+        values, gas = self.values, self.gas
+        if values[x] == gas and values[y] == gas:
+            values[x if x == self.candidate else y] = self.solid
+            self.solid += 1
+        if values[x] == gas:
+            self.candidate = x
+        elif values[y] == gas:
+            self.candidate = y
+        return values[x] - values[y]
+
+
+class KillerItem:
+    __slots__ = ("adversary", "index")
+
+    def __init__(self, adversary, index):
+        self.adversary = adversary
+        self.index = index
+
+    def __lt__(self, other):
+        return self.adversary.compare(self.index, other.index) < 0
+
+    def __le__(self, other):
+        return self.adversary.compare(self.index, other.index) <= 0
+
+    def __gt__(self, other):
+        return self.adversary.compare(self.index, other.index) > 0
+
+    def __ge__(self, other):
+        return self.adversary.compare(self.index, other.index) >= 0
+
+    def __eq__(self, other):
+        return self.adversary.compare(self.index, other.index) == 0
+
+    __hash__ = None
+
+
+# Values that make the registered comparison sort `target` do as much work as it can, by steering every pivot
+# it picks to the bottom of its range. This runs the sort once, so it takes as long as the worst case it finds.
+# Introsort caps the damage by switching to heap sort; the plain Quick Sort is driven all the way to n²/2.
+# Items the sort never had to settle get the ranks left over, and the ranks are spread over low..high; a
+# range narrower than the list merges neighbouring ranks, which takes some of the bite out of the input.
+def quicksort_killer_values(n, rng, low, high, target="Introsort"):
+    adversary = KillerAdversary(n)
+    for _ in ALGORITHMS[target].start([KillerItem(adversary, i) for i in range(n)]):
+        pass
+    ranks = adversary.values
+    rank = adversary.solid
+    for i, value in enumerate(ranks):
+        if value == adversary.gas:
+            ranks[i] = rank
+            rank += 1
+    return spread(ranks, n, low, high)
+
+
+# Every generator by name, as the visualizer's --shape and the benchmark's --shapes take them.
+SHAPES = {
+    "random": random_values,
+    "sorted": sorted_values,
+    "reversed": reversed_values,
+    "few-unique": few_unique_values,
+    "nearly-sorted": nearly_sorted_values,
+    "organ-pipe": organ_pipe_values,
+    "zipf": zipf_values,
+    "quicksort-killer": quicksort_killer_values,
+}
+
+
+# n values of the named shape as a list of ints. high defaults to n, so random data has few repeats.
+def generate(shape, n, rng, low=0, high=None, **options):
+    values = SHAPES[shape](n, rng, low, n if high is None else high, **options)
+    return values.tolist() if numpy is not None and isinstance(values, numpy.ndarray) else list(values)
+
+
+TEXT_SUFFIXES = (".csv", ".txt")
+
+
+# The integers on each line of a text file, separated by commas and/or newlines, one list per line.
+# A first line that doesn't parse is taken to be a CSV header and skipped.
+def text_lines(path):
+    with open(path) as src:
+        for line_number, line in enumerate(src):
+            try:
+                yield [int(field) for field in line.split(",") if field.strip()]
+            except ValueError:
+                if line_number:
+                    raise ValueError(f"{path}, line {line_number + 1}: not a list of integers") from None
+
+
+# Reads a list of ints from a .csv/.txt file (see text_lines), a NumPy .npy file, or any other file as raw
+# native int64s, the format the external sort reads and writes.
+def load_file(path):
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in TEXT_SUFFIXES:
+        return [value for line in text_lines(path) for value in line]
+    if suffix == ".npy":
+        if numpy is None:
+            raise ValueError(f"{path}: reading .npy files needs NumPy installed")
+        return numpy.load(path).astype(numpy.int64).ravel().tolist()
+    size = os.path.getsize(path)
+    if size % 8:
+        raise ValueError(f"{path} is not a file of 64-bit integers ({size} bytes)")
+    values = array('q')
+    with open(path, "rb") as f:
+        values.fromfile(f, size // 8)
+    return values.tolist()
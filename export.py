@@ -0,0 +1,166 @@
+import argparse
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from array import array
+from os import environ
+
+# Frames are drawn on an off-screen surface, so no window is ever needed.
+environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from datasets import SHAPES, make_rng
+from visualizer import (ALGORITHMS, DrawInformation, TraceFile, TracePlayer, draw_list, generate_starting_list,
+                        record_steps, save_trace, start_sort, step_colors)
+
+
+def render_frame(draw_info, title, last_step):
+    draw_info.window.fill(draw_info.BACKGROUND_COLOR)
+    text = draw_info.TITLE_FONT.render(title, 1, draw_info.T_COLOR)
+    draw_info.window.blit(text, (draw_info.width / 2 - text.get_width() / 2, 5))
+    draw_list(draw_info, step_colors(draw_info, last_step) if last_step else {})
+
+
+# Draws frames first..last-1 of a trace, frame f showing the list after f * steps_per_frame steps,
+# and hands each finished surface to write(frame, surface). Only the current frame is ever in memory.
+def render_frames(trace_file, first, last, steps_per_frame, width, height, backing, write):
+    surface = pygame.Surface((width, height))
+    draw_info = DrawInformation(width, height, array('q', trace_file.initial), backing, window=surface)
+    player = TracePlayer(trace_file, draw_info.lst)
+    title = f"{trace_file.name} - {'Ascending' if trace_file.ascending else 'Descending'}"
+    for frame in range(first, last):
+        last_step = player.seek(frame * steps_per_frame)
+        draw_info.drawn = None
+        render_frame(draw_info, title, last_step)
+        write(frame, surface)
+
+
+# Worker process: renders one (trace_path, first, last, steps_per_frame, width, height, backing, out) job,
+# either to a raw RGB file for the parent to stream on, or as PNGs when out is a %-pattern.
+def render_segment(job):
+    trace_path, first, last, steps_per_frame, width, height, backing, out = job
+    if "%" in out:
+        render_frames(TraceFile(trace_path), first, last, steps_per_frame, width, height, backing,
+                      lambda frame, surface: pygame.image.save(surface, out % frame))
+        return out
+    with open(out, "wb") as f:
+        render_frames(TraceFile(trace_path), first, last, steps_per_frame, width, height, backing,
+                      lambda frame, surface: f.write(pygame.image.tobytes(surface, 'RGB')))
+    return out
+
+
+# Workers inherit pygame's SIGTERM handling, so Pool.terminate() (what `with Pool()` does) can hang;
+# let them finish their queue and exit normally instead.
+def close_pool(pool):
+    pool.close()
+    pool.join()
+
+
+def encoder_command(path, width, height, fps):
+    command = ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24",
+               "-s", f"{width}x{height}", "-r", str(fps), "-i", "-"]
+    if not path.endswith(".gif"):
+        command += ["-pix_fmt", "yuv420p"]
+    return command + [path]
+
+
+def export(trace_path, output, fps, steps_per_frame, hold, width, height, backing, jobs):
+    trace_file = TraceFile(trace_path)
+    total = len(trace_file)
+    frames = math.ceil(total / steps_per_frame) + 1 + round(hold * fps)
+
+    # A printf-style pattern such as frames/%05d.png writes one image per frame; no encoder needed.
+    if "%" in output:
+        frame_jobs = [(trace_path, first, last, steps_per_frame, width, height, backing, output)
+                     for first, last in segments(frames, jobs)]
+        if jobs == 1:
+            render_segment(frame_jobs[0])
+        else:
+            pool = multiprocessing.Pool(jobs)
+            pool.map(render_segment, frame_jobs)
+            close_pool(pool)
+        return frames
+
+    if shutil.which("ffmpeg") is None:
+        raise SystemExit("ffmpeg was not found on PATH; install it or export a PNG sequence (e.g. -o frames/%05d.png)")
+
+    encoder = subprocess.Popen(encoder_command(output, width, height, fps), stdin=subprocess.PIPE)
+    try:
+        if jobs == 1:
+            render_frames(trace_file, 0, frames, steps_per_frame, width, height, backing,
+                          lambda frame, surface: encoder.stdin.write(pygame.image.tobytes(surface, 'RGB')))
+        else:
+            # Segments are rendered in parallel to temporary files and streamed to the encoder in order,
+            # so memory use stays at one frame per worker however long the video is.
+            with tempfile.TemporaryDirectory() as tmp:
+                parts = [(trace_path, first, last, steps_per_frame, width, height, backing,
+                          os.path.join(tmp, f"segment{k}.rgb")) for k, (first, last) in
+                         enumerate(segments(frames, jobs))]
+                pool = multiprocessing.Pool(jobs)
+                for part in pool.imap(render_segment, parts):
+                    with open(part, "rb") as f:
+                        shutil.copyfileobj(f, encoder.stdin)
+                    os.remove(part)
+                close_pool(pool)
+    finally:
+        encoder.stdin.close()
+        encoder.wait()
+    if encoder.returncode:
+        raise SystemExit(f"ffmpeg failed with exit code {encoder.returncode}")
+    return frames
+
+
+# Splits range(frames) into `parts` contiguous (first, last) pieces of near-equal length.
+def segments(frames, parts):
+    bounds = [frames * k // parts for k in range(parts + 1)]
+    return [(bounds[k], bounds[k + 1]) for k in range(parts) if bounds[k] < bounds[k + 1]]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Render a sort to a video, GIF or PNG sequence without a window.")
+    parser.add_argument("-o", "--output", required=True,
+                        help="output file (.mp4, .gif, ... encoded by ffmpeg) or a PNG pattern like frames/%%05d.png")
+    parser.add_argument("--trace", metavar="PATH", help="export an existing trace file instead of running a sort")
+    parser.add_argument("--algorithm", choices=list(ALGORITHMS), default="Quick Sort")
+    parser.add_argument("--size", type=int, default=50)
+    parser.add_argument("--shape", choices=list(SHAPES), default="random", help="distribution of the list to sort")
+    parser.add_argument("--seed", type=int, help="seed for the list, so an export can be repeated")
+    parser.add_argument("--descending", action="store_true")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="target length in seconds; sets the steps per frame (default: 10)")
+    parser.add_argument("--steps-per-frame", type=int, help="steps drawn per frame, overrides --duration")
+    parser.add_argument("--hold", type=float, default=1.0, help="seconds to hold the sorted result at the end")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--backing", choices=DrawInformation.BACKINGS, default="list")
+    parser.add_argument("--jobs", type=int, default=1, help="render frame segments in this many processes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        trace_path = args.trace
+        if trace_path is None:
+            lst = generate_starting_list(args.size, 0, 100, args.shape, make_rng(args.seed))
+            initial = array('q', lst)
+            trace = record_steps(start_sort(ALGORITHMS[args.algorithm], lst, not args.descending))
+            trace_path = os.path.join(tmp, "export.trace")
+            save_trace(trace_path, initial, trace, args.algorithm, not args.descending)
+
+        total = len(TraceFile(trace_path))
+        steps_per_frame = args.steps_per_frame or max(1, math.ceil(total / (args.duration * args.fps)))
+        frames = export(trace_path, args.output, args.fps, steps_per_frame, args.hold, args.width, args.height,
+                        args.backing, args.jobs)
+    print(f"Wrote {frames} frames ({total} steps, {steps_per_frame} per frame) to {args.output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,242 @@
+import heapq
+import mmap
+import os
+import tempfile
+from array import array
+from itertools import chain, islice
+
+from datasets import TEXT_SUFFIXES, text_lines
+from sorting import STEP_COMPARE, STEP_DONE, STEP_RANGE, STEP_SWAP, STEP_WRITE, start_sort
+
+# Values per run. Each run is read, sorted in memory and spilled on its own, so this bounds the memory in use.
+RUN_LENGTH = 100000
+# Most runs merged at once. More runs than this are merged in several passes, as every run holds an open map.
+FAN_IN = 64
+# Values taken from the merge and written to disk at a time.
+MERGE_BLOCK = 65536
+# Steps of the in-memory sort between the heartbeats yielded while a run is sorted.
+HEARTBEAT = 1024
+
+
+def is_text(path):
+    return os.path.splitext(path)[1].lower() in TEXT_SUFFIXES
+
+
+# Converts a text file of integers (see datasets.text_lines) into native int64s a chunk at a time.
+def text_to_binary(path, out, chunk=RUN_LENGTH):
+    values = array('q')
+    with open(out, "wb") as dst:
+        for line in text_lines(path):
+            values.extend(line)
+            if len(values) >= chunk:
+                values.tofile(dst)
+                del values[:]
+        values.tofile(dst)
+
+
+# Maps a binary file of native int64s read-only and returns (map, int64 view); the map is None for an empty file.
+def map_values(path):
+    size = os.path.getsize(path)
+    if size % 8:
+        raise ValueError(f"{path} is not a file of 64-bit integers ({size} bytes)")
+    if not size:
+        return None, memoryview(array('q'))
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapped, memoryview(mapped).cast('q')
+
+
+# Tells the kernel this process is done with bytes start..end-1 of a read-only map. The pages stay in the page
+# cache, but no longer count towards the process's memory, so reading a whole file doesn't grow it.
+def drop_pages(mapped, start, end):
+    if mapped is not None and hasattr(mmap, "MADV_DONTNEED"):
+        start -= start % mmap.PAGESIZE
+        mapped.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+# Iterates over the values of a mapped run a block at a time, dropping each block's pages once it has been read.
+def stream_values(mapped, values, block=MERGE_BLOCK):
+    def blocks():
+        for lo in range(0, len(values), block):
+            yield values[lo: lo + block]
+            drop_pages(mapped, 8 * lo, 8 * min(lo + block, len(values)))
+
+    return chain.from_iterable(blocks())
+
+
+class ExternalSort:
+    """Sorts a file of integers too big to hold in memory.
+
+    The input is cut into runs of run_length values. Each run is sorted in memory by one of the sorting
+    generators and spilled to a temporary file. The run files are then merged back with a k-way heap
+    merge, FAN_IN files at a time. Files are read through memory maps; text (.csv/.txt) input is first
+    converted to binary. The output is binary int64s, or one value per line for a .csv/.txt path.
+
+    steps() does the work and reports it as steps on a view: a short list of values sampled from
+    the file (see sample()), so the visualizer can draw it like any other sort.
+    """
+
+    def __init__(self, path, output, algorithm, ascending=True, run_length=RUN_LENGTH, tmpdir=None):
+        self.output = output
+        self.algorithm = algorithm
+        self.ascending = ascending
+        self.run_length = run_length
+        self.tmp = tempfile.TemporaryDirectory(dir=tmpdir)
+        if is_text(path):
+            source = os.path.join(self.tmp.name, "input.bin")
+            text_to_binary(path, source)
+            path = source
+        self.map, self.values = map_values(path)
+        self.n = len(self.values)
+        self.run_count = -(-self.n // run_length)
+
+        self.phase = "runs"
+        self.runs_sorted = 0
+        # Merge passes finished, and the values written so far by the current one.
+        self.passes = 0
+        self.merged = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        # The view's range; values written to it are clamped to this so every bar stays inside the plot.
+        self.low = self.high = 0
+
+    # File position shown by bar i of a view of `bars` bars.
+    def position(self, i, bars):
+        return i * self.n // bars
+
+    # Bars of the view whose positions are in lo..hi-1.
+    def bars_between(self, lo, hi, bars):
+        return range(-(-lo * bars // self.n), -(-hi * bars // self.n))
+
+    # Bar of the view that shows file position p, or 0 without a view.
+    def bar_at(self, p, view):
+        return p * len(view) // self.n if view is not None else 0
+
+    def sample(self, bars):
+        bars = min(bars, self.n)
+        return [self.values[self.position(i, bars)] for i in range(bars)]
+
+    def shown(self, value):
+        return min(max(value, self.low), self.high)
+
+    # Sorts the file into self.output. With a view, every run and merge group is announced as a RANGE over
+    # its bars and the bars are rewritten as their positions change; without one only the heartbeats are
+    # yielded, so the caller can still stop between them. Returns the output path.
+    def steps(self, view=None):
+        if view is not None and not len(view):
+            view = None
+        if view is not None:
+            self.low, self.high = min(view), max(view)
+        try:
+            runs = []
+            for k, lo in enumerate(range(0, self.n, self.run_length)):
+                path = os.path.join(self.tmp.name, f"run{k}.bin")
+                hi = min(lo + self.run_length, self.n)
+                yield from self.sort_run(lo, hi, path, view)
+                runs.append((path, lo, hi))
+                self.runs_sorted += 1
+            self.release_input()
+
+            self.phase = "merge"
+            while len(runs) > FAN_IN:
+                merged = []
+                for k in range(0, len(runs), FAN_IN):
+                    group = runs[k: k + FAN_IN]
+                    path = os.path.join(self.tmp.name, f"pass{self.passes}-{k // FAN_IN}.bin")
+                    yield from self.merge_runs(group, path, view)
+                    merged.append((path, group[0][1], group[-1][2]))
+                runs = merged
+                self.passes += 1
+                self.merged = 0
+            yield from self.merge_runs(runs, self.output, view)
+            self.passes += 1
+            self.phase = "done"
+            if view is not None:
+                yield STEP_DONE, 0, len(view) - 1
+        finally:
+            self.close()
+        return self.output
+
+    def sort_run(self, lo, hi, path, view):
+        chunk = self.values[lo:hi].tolist()
+        drop_pages(self.map, 8 * lo, 8 * hi)
+        self.bytes_read += 8 * (hi - lo)
+        bars = self.bars_between(lo, hi, len(view)) if view is not None else range(0)
+        if bars:
+            yield STEP_RANGE, bars[0], bars[-1]
+        # The sorts change the list before yielding a step, so a moved sampled position is read straight away.
+        sampled = {self.position(i, len(view)) - lo: i for i in bars}
+        count = 0
+        for kind, a, b in start_sort(self.algorithm, chunk, self.ascending):
+            if sampled and (kind == STEP_SWAP or kind == STEP_WRITE):
+                for j in (a, b) if kind == STEP_SWAP else (a,):
+                    if j in sampled:
+                        view[sampled[j]] = self.shown(chunk[j])
+                        yield STEP_WRITE, sampled[j], view[sampled[j]]
+            count += 1
+            if not count % HEARTBEAT:
+                yield STEP_COMPARE, self.bar_at(lo + a, view), self.bar_at(lo + a, view)
+        with open(path, "wb") as f:
+            array('q', chunk).tofile(f)
+        self.bytes_written += 8 * (hi - lo)
+
+    # Merges the run files in `group`, which hold positions lo..hi-1 between them, into path. The merged
+    # values land on those same positions, so each bar is rewritten once the merge has got past it.
+    def merge_runs(self, group, path, view):
+        lo, hi = (group[0][1], group[-1][2]) if group else (0, 0)
+        bars = self.bars_between(lo, hi, len(view)) if view is not None else range(0)
+        if bars:
+            yield STEP_RANGE, bars[0], bars[-1]
+        maps = [map_values(run) for run, _, _ in group]
+        merged = heapq.merge(*(stream_values(mapped, values) for mapped, values in maps), reverse=not self.ascending)
+        text = is_text(path)
+        position = lo
+        bar = iter(bars)
+        next_bar = next(bar, None)
+        with open(path, "w" if text else "wb") as f:
+            while True:
+                block = array('q', islice(merged, MERGE_BLOCK))
+                if not block:
+                    break
+                if text:
+                    f.write("\n".join(map(str, block)) + "\n")
+                else:
+                    block.tofile(f)
+                end = position + len(block)
+                self.merged += len(block)
+                self.bytes_read += 8 * len(block)
+                self.bytes_written += 8 * len(block)
+                while next_bar is not None and self.position(next_bar, len(view)) < end:
+                    view[next_bar] = self.shown(block[self.position(next_bar, len(view)) - position])
+                    yield STEP_WRITE, next_bar, view[next_bar]
+                    next_bar = next(bar, None)
+                position = end
+                yield STEP_COMPARE, self.bar_at(position - 1, view), self.bar_at(position - 1, view)
+
+        for (run, _, _), (mapped, values) in zip(group, maps):
+            values.release()
+            if mapped is not None:
+                mapped.close()
+            os.remove(run)
+
+    # The runs hold everything once they are written, so the input isn't kept mapped during the merge.
+    def release_input(self):
+        self.values.release()
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def close(self):
+        self.release_input()
+        self.tmp.cleanup()
+
+    def hud_text(self, seconds):
+        if self.phase == "runs":
+            progress = f"Sorting run {min(self.runs_sorted + 1, self.run_count)} / {self.run_count}"
+        elif self.phase == "merge":
+            progress = f"Merge pass {self.passes + 1}: {100 * self.merged // max(self.n, 1)}%"
+        else:
+            progress = (f"Sorted {self.n} values in {self.run_count} run{'s' if self.run_count > 1 else ''}, "
+                        f"{self.passes} merge pass{'es' if self.passes > 1 else ''}")
+        rate = (self.bytes_read + self.bytes_written) / seconds / 1e6 if seconds else 0
+        return f"{progress}  |  I/O {rate:.1f} MB/s"
@@ -0,0 +1,198 @@
+import bisect
+import math
+import time
+
+from sorting import STEP_COMPARE, STEP_DONE
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SortedIndex:
+    """Lookup structure for one sorted list, built once and reused for every query against it.
+
+    The keys are kept in ascending order whatever the list's direction, as a Python list for single
+    lookups with bisect and, when NumPy is available, as an int64 array for whole batches at once.
+    Both return the index of the first occurrence in the original list, or -1.
+    """
+
+    def __init__(self, values, ascending=True):
+        keys = [int(value) for value in values]
+        if not ascending:
+            keys.reverse()
+        self.n = len(keys)
+        self.ascending = ascending
+        self.keys = keys
+        self.array = numpy.array(keys, dtype=numpy.int64) if numpy is not None else None
+
+    def find(self, target):
+        keys = self.keys
+        if self.ascending:
+            i = bisect.bisect_left(keys, target)
+            return i if i < self.n and keys[i] == target else -1
+        # In a descending list the first occurrence is the last one among the ascending keys.
+        i = bisect.bisect_right(keys, target) - 1
+        return self.n - 1 - i if i >= 0 and keys[i] == target else -1
+
+    def find_many(self, targets):
+        if self.array is None:
+            return self.find_sorted(targets)
+        targets = numpy.asarray(targets, dtype=numpy.int64)
+        if not self.n:
+            return numpy.full(len(targets), -1)
+        if self.ascending:
+            found = numpy.searchsorted(self.array, targets, "left")
+        else:
+            found = numpy.searchsorted(self.array, targets, "right") - 1
+        clipped = found.clip(0, self.n - 1)
+        hit = (found >= 0) & (found < self.n) & (self.array[clipped] == targets)
+        return numpy.where(hit, clipped if self.ascending else self.n - 1 - clipped, -1)
+
+    # Without NumPy the batch is answered in sorted order, so every bisect starts where the last one ended.
+    def find_sorted(self, targets):
+        keys = self.keys
+        result = [-1] * len(targets)
+        lo = 0
+        for k in sorted(range(len(targets)), key=targets.__getitem__):
+            target = targets[k]
+            if self.ascending:
+                lo = bisect.bisect_left(keys, target, lo)
+                if lo < self.n and keys[lo] == target:
+                    result[k] = lo
+            else:
+                lo = bisect.bisect_right(keys, target, lo)
+                if lo and keys[lo - 1] == target:
+                    result[k] = self.n - lo
+        return result
+
+
+# Queries per second of answer() over the queries, repeated until `budget` seconds have passed.
+# answer takes one query, or the whole list when batched is set.
+def queries_per_second(answer, queries, batched=False, budget=0.05):
+    clock = time.perf_counter
+    answered = 0
+    start = clock()
+    while True:
+        if batched:
+            answer(queries)
+            answered += len(queries)
+        else:
+            for query in queries:
+                answer(query)
+                answered += 1
+                if clock() - start > budget:
+                    break
+        elapsed = clock() - start
+        if elapsed > budget:
+            return answered / elapsed
+
+
+def rate_label(per_second):
+    if per_second >= 1e6:
+        return f"{per_second / 1e6:.1f}M"
+    if per_second >= 1e3:
+        return f"{per_second / 1e3:.0f}k"
+    return f"{per_second:.0f}"
+
+
+# Searches look for target in a list sorted in the given direction and return an index where it
+# occurs, or -1. Each probe is yielded as a COMPARE of that index with itself and a hit as a DONE on it.
+def linear_search(lst, target, ascending=True):
+    for i, value in enumerate(lst):
+        yield STEP_COMPARE, i, i
+        if value == target:
+            yield STEP_DONE, i, i
+            return i
+        if value > target if ascending else value < target:
+            break  # the list is sorted, so the target can't come later
+    return -1
+
+
+# Finds the first occurrence within lst[lo:hi].
+def binary_search(lst, target, ascending=True, lo=0, hi=None):
+    if hi is None:
+        hi = len(lst)
+    end = hi
+    while lo < hi:
+        mid = (lo + hi) // 2
+        yield STEP_COMPARE, mid, mid
+        if lst[mid] < target if ascending else lst[mid] > target:
+            lo = mid + 1
+        else:
+            hi = mid
+    if lo < end and lst[lo] == target:
+        yield STEP_DONE, lo, lo
+        return lo
+    return -1
+
+
+# Probes where the target would be if the values were spread evenly between the ends of the range.
+def interpolation_search(lst, target, ascending=True):
+    sign = 1 if ascending else -1
+    lo, hi = 0, len(lst) - 1
+    while lo <= hi and sign * lst[lo] <= sign * target <= sign * lst[hi]:
+        if lst[lo] == lst[hi]:
+            pos = lo
+        else:
+            pos = lo + sign * (target - lst[lo]) * (hi - lo) // (sign * (lst[hi] - lst[lo]))
+        yield STEP_COMPARE, pos, pos
+        if lst[pos] == target:
+            yield STEP_DONE, pos, pos
+            return pos
+        if sign * lst[pos] < sign * target:
+            lo = pos + 1
+        else:
+            hi = pos - 1
+    return -1
+
+
+# Doubles a bound until it reaches the target, then binary searches the last doubling.
+def exponential_search(lst, target, ascending=True):
+    n = len(lst)
+    bound = 1
+    while bound < n:
+        yield STEP_COMPARE, bound, bound
+        if not (lst[bound] < target if ascending else lst[bound] > target):
+            break
+        bound *= 2
+    return (yield from binary_search(lst, target, ascending, bound // 2, min(bound + 1, n)))
+
+
+# Jumps ahead sqrt(n) elements at a time, then scans the block the target must be in.
+def jump_search(lst, target, ascending=True):
+    n = len(lst)
+    step = max(1, math.isqrt(n))
+    start = 0
+    while start + step - 1 < n:
+        last = start + step - 1
+        yield STEP_COMPARE, last, last
+        if not (lst[last] < target if ascending else lst[last] > target):
+            break
+        start += step
+    for i in range(start, min(start + step, n)):
+        yield STEP_COMPARE, i, i
+        if lst[i] == target:
+            yield STEP_DONE, i, i
+            return i
+        if not (lst[i] < target if ascending else lst[i] > target):
+            break
+    return -1
+
+
+SEARCHES = {
+    "Linear Search": linear_search,
+    "Binary Search": binary_search,
+    "Interpolation Search": interpolation_search,
+    "Exponential Search": exponential_search,
+    "Jump Search": jump_search,
+}
+
+
+def sorted_direction(lst):
+    if all(lst[i] <= lst[i + 1] for i in range(len(lst) - 1)):
+        return True
+    if all(lst[i] >= lst[i + 1] for i in range(len(lst) - 1)):
+        return False
+    return None
@@ -0,0 +1,1249 @@
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+from os import cpu_count
+import hashlib
+import random
+import time
+import json
+import multiprocessing
+from array import array
+
+
+# Step events yielded by the sorting generators. Every step is a tuple (kind, a, b):
+# COMPARE/SWAP carry two indices, WRITE carries the index and the value written,
+# PIVOT carries the pivot index twice and DONE carries an inclusive range that is now in order.
+# RANGE carries the inclusive range a parallel sort has just handed to one of its workers.
+STEP_COMPARE = 0
+STEP_SWAP = 1
+STEP_WRITE = 2
+STEP_PIVOT = 3
+STEP_DONE = 4
+STEP_RANGE = 5
+
+STEP_NAMES = ("compare", "swap", "write", "pivot", "done", "range")
+
+
+class StepTrace:
+    """Array-backed buffer of step events, three signed 64-bit ints per step."""
+
+    def __init__(self):
+        self.buffer = array('q')
+
+    def append(self, step):
+        self.buffer.extend(step)
+
+    def __len__(self):
+        return len(self.buffer) // 3
+
+    def nbytes(self):
+        return len(self.buffer) * self.buffer.itemsize
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        k = 3 * index
+        return self.buffer[k], self.buffer[k + 1], self.buffer[k + 2]
+
+    def __iter__(self):
+        buffer = self.buffer
+        for k in range(0, len(buffer), 3):
+            yield buffer[k], buffer[k + 1], buffer[k + 2]
+
+
+def generator_depth(generator):
+    # Number of generator frames a step resumes through, following the yield-from chain.
+    depth = 0
+    while generator is not None:
+        depth += 1
+        generator = generator.gi_yieldfrom
+    return depth
+
+
+class Instrumentation:
+    """Counts the steps a sort yields, optionally with its generator depth and per-step timing.
+
+    Sorts report through it by being wrapped: instrumentation.wrap(generator) yields the same steps.
+    Unwrapped generators pay nothing, so leave it out wherever timing matters. Hooks are called as
+    hook(step, seconds) with the time the algorithm spent producing that step.
+    """
+
+    def __init__(self, track_depth=False, hooks=()):
+        self.track_depth = track_depth
+        self.hooks = list(hooks)
+        self.counts = [0] * len(STEP_NAMES)
+        self.max_depth = 0
+        self.seconds = 0.0
+
+    def wrap(self, generator):
+        counts = self.counts
+        if not self.track_depth and not self.hooks:
+            for step in generator:
+                counts[step[0]] += 1
+                yield step
+            return
+
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                step = next(generator)
+            except StopIteration as stop:
+                self.seconds += clock() - start
+                return stop.value
+            elapsed = clock() - start
+            self.seconds += elapsed
+            counts[step[0]] += 1
+            if self.track_depth:
+                self.max_depth = max(self.max_depth, generator_depth(generator))
+            for hook in self.hooks:
+                hook(step, elapsed)
+            yield step
+
+    def summary(self):
+        summary = dict(zip(STEP_NAMES, self.counts))
+        summary["steps"] = sum(self.counts)
+        if self.track_depth:
+            summary["max_depth"] = self.max_depth
+        if self.track_depth or self.hooks:
+            summary["algorithm_seconds"] = self.seconds
+        return summary
+
+    def hud_text(self):
+        text = (f"Compares: {self.counts[STEP_COMPARE]}  Swaps: {self.counts[STEP_SWAP]}  "
+                f"Writes: {self.counts[STEP_WRITE]}")
+        if self.track_depth:
+            text += f"  Depth: {self.max_depth}"
+        return text
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def start_sort(algorithm, lst, ascending):
+    return algorithm.start(lst, ascending)
+
+
+# Upper bound on what the result cache keeps: its sorted arrays plus step traces.
+RESULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# A finished run: the sorted values, its StepTrace (None when only counted), its step counts and max depth.
+CachedRun = namedtuple("CachedRun", "final trace counts max_depth")
+
+
+def cached_bytes(entry):
+    size = len(entry.final) * entry.final.itemsize
+    if entry.trace is not None:
+        size += entry.trace.nbytes()
+    return size
+
+
+def result_key(values, name, ascending):
+    digest = hashlib.blake2b(array('q', values).tobytes(), digest_size=16).digest()
+    return digest, name, ascending
+
+
+class ResultCache:
+    """LRU cache of finished runs, keyed by result_key(): a hash of the input, the algorithm and the direction.
+
+    Repeating a run on the same list can replay the stored steps or jump straight to the stored result
+    instead of running the algorithm again. The least recently used runs are evicted once the cache
+    holds more than max_bytes of values and steps; a run bigger than that on its own isn't kept.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, final, trace, counts, max_depth):
+        entry = CachedRun(array('q', final), trace, list(counts), max_depth)
+        size = cached_bytes(entry)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.bytes -= cached_bytes(self.entries.pop(key))
+        self.entries[key] = entry
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= cached_bytes(evicted)
+            self.evictions += 1
+
+    def hud_text(self):
+        return f"Cache: {self.hits} hits, {self.misses} misses"
+
+
+# Plays recorded steps back onto lst, yielding them like the sort that recorded them.
+def replay_steps(lst, trace):
+    for step in trace:
+        apply_step(lst, step)
+        yield step
+
+
+def apply_step(lst, step):
+    kind, a, b = step
+    if kind == STEP_SWAP:
+        lst[a], lst[b] = lst[b], lst[a]
+    elif kind == STEP_WRITE:
+        lst[a] = b
+
+
+# Copies int64 values (a memoryview or array) into lst in place, whatever its backing.
+def load_values(lst, values):
+    if isinstance(lst, array):
+        memoryview(lst)[:] = values
+    elif isinstance(lst, list):
+        lst[:] = values.tolist()
+    else:
+        lst[:] = values
+
+
+# Runs a sorting generator to completion without drawing anything.
+def record_steps(generator, trace=None):
+    if trace is None:
+        trace = StepTrace()
+    for step in generator:
+        trace.append(step)
+    return trace
+
+
+def bubble_sort(lst, ascending=True):
+    for i in range(len(lst) - 1):
+        for j in range(len(lst) - 1 - i):
+            num1 = lst[j]
+            num2 = lst[j + 1]
+            yield STEP_COMPARE, j, j + 1
+
+            if (num1 > num2 and ascending) or (num1 < num2 and not ascending):
+                lst[j], lst[j + 1] = lst[j + 1], lst[j]
+                yield STEP_SWAP, j, j + 1
+        yield STEP_DONE, len(lst) - 1 - i, len(lst) - 1 - i
+    return lst
+
+
+def insertion_sort(lst, ascending=True):
+    for i in range(1, len(lst)):
+        current = lst[i]
+        while True:
+            if i > 0:
+                yield STEP_COMPARE, i - 1, i
+            ascending_sort = i > 0 and lst[i - 1] > current and ascending
+            descending_sort = i > 0 and lst[i - 1] < current and not ascending
+
+            if not ascending_sort and not descending_sort:
+                break
+
+            lst[i] = lst[i - 1]
+            i = i - 1
+            lst[i] = current
+            yield STEP_SWAP, i, i + 1
+    return lst
+
+
+def selection_sort(lst, ascending=True):
+    n = len(lst)
+    for i in range(n):
+        swap_inx = i
+        for j in range(i + 1, n):
+            yield STEP_COMPARE, j, swap_inx
+            if (ascending and lst[j] < lst[swap_inx]) or (not ascending and lst[j] > lst[swap_inx]):
+                swap_inx = j
+
+        # Swap the elements
+        lst[i], lst[swap_inx] = lst[swap_inx], lst[i]
+        yield STEP_SWAP, i, swap_inx
+        yield STEP_DONE, i, i
+    return lst
+
+
+# Implementing Merge sort by 2 functions - merge&merge sort
+# Only the left run is copied out, into `buffer`; the right run is merged from where it lies, since the
+# output never overtakes it. Whatever is left of the right run at the end is already in place.
+def merge(lst, left, mid, right, ascending=True, buffer=None):
+    left_length = mid + 1 - left
+    if buffer is None:
+        buffer = [None] * left_length
+    for k in range(left_length):
+        buffer[k] = lst[left + k]
+    left_copy_index = 0
+    right_index = mid + 1
+    sorted_index = left
+
+    while left_copy_index < left_length and right_index <= right:
+        yield STEP_COMPARE, left + left_copy_index, right_index
+        if (buffer[left_copy_index] < lst[right_index] and ascending) or (
+                buffer[left_copy_index] >= lst[right_index] and not ascending):
+            lst[sorted_index] = buffer[left_copy_index]
+            left_copy_index += 1
+        else:
+            lst[sorted_index] = lst[right_index]
+            right_index += 1
+
+        yield STEP_WRITE, sorted_index, lst[sorted_index]
+        sorted_index += 1
+
+    while left_copy_index < left_length:
+        lst[sorted_index] = buffer[left_copy_index]
+        yield STEP_WRITE, sorted_index, lst[sorted_index]
+        left_copy_index += 1
+        sorted_index += 1
+
+    yield STEP_DONE, left, right
+
+
+# Top-down merge sort on an explicit stack rather than by recursion, so a step resumes through the same two
+# generator frames however deep the split is. Every merge shares one buffer the size of the largest left half.
+def merge_sort(lst, left, right, ascending=True):
+    if left >= right:
+        return
+    buffer = [None] * ((right - left) // 2 + 1)
+    stack = [(left, right, False)]
+    while stack:
+        lo, hi, halves_sorted = stack.pop()
+        mid = (lo + hi) // 2
+        if halves_sorted:
+            yield from merge(lst, lo, mid, hi, ascending, buffer)
+            continue
+        stack.append((lo, hi, True))
+        if mid + 1 < hi:
+            stack.append((mid + 1, hi, False))
+        if lo < mid:
+            stack.append((lo, mid, False))
+
+
+def quick_sort(lst, ascending=True):
+
+    def partition(low, high):
+        pivot = lst[high]
+        yield STEP_PIVOT, high, high
+        i = low - 1
+        for j in range(low, high):
+            yield STEP_COMPARE, j, high
+            if (lst[j] < pivot and ascending) or (lst[j] > pivot and not ascending):
+                i += 1
+                lst[i], lst[j] = lst[j], lst[i]
+                yield STEP_SWAP, i, j
+        lst[i + 1], lst[high] = lst[high], lst[i + 1]
+        yield STEP_SWAP, i + 1, high
+        yield STEP_DONE, i + 1, i + 1
+        return i + 1
+
+    # The smaller side of each partition is sorted first while the larger one waits on a stack, so the stack never
+    # holds more than log2(n) ranges, even on sorted input where every partition is as lopsided as it gets.
+    stack = [(0, len(lst) - 1)]
+    while stack:
+        low, high = stack.pop()
+        while low < high:
+            pi = yield from partition(low, high)
+            if pi - low < high - pi:
+                stack.append((pi + 1, high))
+                high = pi - 1
+            else:
+                stack.append((low, pi - 1))
+                low = pi + 1
+    return lst
+
+
+def cocktail_shaker_sort(lst, ascending=True):
+    n = len(lst)
+    swapped = True
+    start = 0
+    end = n - 1
+
+    while swapped:
+        swapped = False
+        for i in range(start, end):
+            yield STEP_COMPARE, i, i + 1
+            if (ascending and lst[i] > lst[i + 1]) or (not ascending and lst[i] < lst[i + 1]):
+                lst[i], lst[i + 1] = lst[i + 1], lst[i]
+                swapped = True
+                yield STEP_SWAP, i, i + 1
+
+        if not swapped:
+            break
+
+        swapped = False
+        end = end - 1
+        yield STEP_DONE, end + 1, end + 1
+
+        for i in range(end - 1, start - 1, -1):
+            yield STEP_COMPARE, i, i + 1
+            if (ascending and lst[i] > lst[i + 1]) or (not ascending and lst[i] < lst[i + 1]):
+                lst[i], lst[i + 1] = lst[i + 1], lst[i]
+                swapped = True
+                yield STEP_SWAP, i, i + 1
+
+        yield STEP_DONE, start, start
+        start = start + 1
+
+
+# Sifts lst[i] down the heap of the first n elements, one level per pass of the loop.
+def heapify(lst, n, i, ascending=True):
+    while True:
+        largest = i
+        l = 2 * i + 1
+        r = 2 * i + 2
+
+        if l < n:
+            yield STEP_COMPARE, i, l
+            if (lst[i] < lst[l] and ascending) or (lst[i] > lst[l] and not ascending):
+                largest = l
+
+        if r < n:
+            yield STEP_COMPARE, largest, r
+            if (lst[largest] < lst[r] and ascending) or (lst[largest] > lst[r] and not ascending):
+                largest = r
+
+        if largest == i:
+            return
+        lst[i], lst[largest] = lst[largest], lst[i]
+        yield STEP_SWAP, i, largest
+        i = largest
+
+
+def heap_sort(lst, ascending=True):
+    n = len(lst)
+
+    for i in range(n // 2 - 1, -1, -1):
+        yield from heapify(lst, n, i, ascending)
+
+    for i in range(n - 1, 0, -1):
+        lst[i], lst[0] = lst[0], lst[i]
+        yield STEP_SWAP, i, 0
+        yield STEP_DONE, i, i
+        yield from heapify(lst, i, 0, ascending)
+    return lst
+
+
+def insertion_sort_range(lst, lo, hi, ascending=True):
+    # Sorts lst[lo..hi] (inclusive) in place; the small-range fallback of introsort and MSD radix sort.
+    for i in range(lo + 1, hi + 1):
+        j = i
+        while j > lo:
+            yield STEP_COMPARE, j - 1, j
+            if not ((lst[j] < lst[j - 1]) if ascending else (lst[j] > lst[j - 1])):
+                break
+            lst[j - 1], lst[j] = lst[j], lst[j - 1]
+            yield STEP_SWAP, j - 1, j
+            j -= 1
+
+
+# Timsort as in CPython's listsort: natural runs extended to minrun with binary insertion sort,
+# a run stack kept balanced by merge_collapse, and merges that switch into galloping mode
+# once one run keeps winning.
+MIN_GALLOP = 7
+
+
+def min_run_length(n):
+    r = 0
+    while n >= 64:
+        r |= n & 1
+        n >>= 1
+    return n + r
+
+
+def timsort(lst, ascending=True):
+    n = len(lst)
+    runs = []
+    min_gallop = MIN_GALLOP
+
+    def lt(a, b):  # a must come strictly before b
+        return a < b if ascending else b < a
+
+    def copy_into(dest, source, start, count):
+        # Right-to-left when shifting lst upwards onto itself, so nothing is overwritten before it is read.
+        order = range(count - 1, -1, -1) if source is lst and dest > start else range(count)
+        for k in order:
+            lst[dest + k] = source[start + k]
+            yield STEP_WRITE, dest + k, lst[dest + k]
+
+    def reverse_range(lo, hi):
+        hi -= 1
+        while lo < hi:
+            lst[lo], lst[hi] = lst[hi], lst[lo]
+            yield STEP_SWAP, lo, hi
+            lo += 1
+            hi -= 1
+
+    # Length of the run starting at lo; strictly descending runs are reversed in place.
+    def count_run(lo, hi):
+        run_hi = lo + 1
+        if run_hi == hi:
+            return 1
+        yield STEP_COMPARE, lo, run_hi
+        if lt(lst[run_hi], lst[lo]):
+            run_hi += 1
+            while run_hi < hi:
+                yield STEP_COMPARE, run_hi - 1, run_hi
+                if not lt(lst[run_hi], lst[run_hi - 1]):
+                    break
+                run_hi += 1
+            yield from reverse_range(lo, run_hi)
+        else:
+            run_hi += 1
+            while run_hi < hi:
+                yield STEP_COMPARE, run_hi - 1, run_hi
+                if lt(lst[run_hi], lst[run_hi - 1]):
+                    break
+                run_hi += 1
+        return run_hi - lo
+
+    def binary_insertion_sort(lo, hi, start):
+        for i in range(start, hi):
+            pivot = lst[i]
+            left, right = lo, i
+            while left < right:
+                mid = (left + right) // 2
+                yield STEP_COMPARE, mid, i
+                if lt(pivot, lst[mid]):
+                    right = mid
+                else:
+                    left = mid + 1
+            yield from copy_into(left + 1, lst, left, i - left)
+            lst[left] = pivot
+            yield STEP_WRITE, left, pivot
+
+    # Both gallops search a[base:base+length] starting near `hint`. `shown` is the list index drawn for
+    # a[base] (temp copies are drawn at the position they came from) and key_at is the key's index.
+    # gallop_left returns how many elements are strictly before key, gallop_right how many are not after it.
+    def gallop_left(key, key_at, a, base, length, hint, shown):
+        last_ofs, ofs = 0, 1
+        yield STEP_COMPARE, key_at, shown + hint
+        if lt(a[base + hint], key):
+            max_ofs = length - hint
+            while ofs < max_ofs:
+                yield STEP_COMPARE, key_at, shown + hint + ofs
+                if not lt(a[base + hint + ofs], key):
+                    break
+                last_ofs, ofs = ofs, (ofs << 1) + 1
+            ofs = min(ofs, max_ofs)
+            last_ofs, ofs = last_ofs + hint, ofs + hint
+        else:
+            max_ofs = hint + 1
+            while ofs < max_ofs:
+                yield STEP_COMPARE, key_at, shown + hint - ofs
+                if lt(a[base + hint - ofs], key):
+                    break
+                last_ofs, ofs = ofs, (ofs << 1) + 1
+            ofs = min(ofs, max_ofs)
+            last_ofs, ofs = hint - ofs, hint - last_ofs
+        last_ofs += 1
+        while last_ofs < ofs:
+            m = last_ofs + ((ofs - last_ofs) >> 1)
+            yield STEP_COMPARE, key_at, shown + m
+            if lt(a[base + m], key):
+                last_ofs = m + 1
+            else:
+                ofs = m
+        return ofs
+
+    def gallop_right(key, key_at, a, base, length, hint, shown):
+        last_ofs, ofs = 0, 1
+        yield STEP_COMPARE, key_at, shown + hint
+        if lt(key, a[base + hint]):
+            max_ofs = hint + 1
+            while ofs < max_ofs:
+                yield STEP_COMPARE, key_at, shown + hint - ofs
+                if not lt(key, a[base + hint - ofs]):
+                    break
+                last_ofs, ofs = ofs, (ofs << 1) + 1
+            ofs = min(ofs, max_ofs)
+            last_ofs, ofs = hint - ofs, hint - last_ofs
+        else:
+            max_ofs = length - hint
+            while ofs < max_ofs:
+                yield STEP_COMPARE, key_at, shown + hint + ofs
+                if lt(key, a[base + hint + ofs]):
+                    break
+                last_ofs, ofs = ofs, (ofs << 1) + 1
+            ofs = min(ofs, max_ofs)
+            last_ofs, ofs = last_ofs + hint, ofs + hint
+        last_ofs += 1
+        while last_ofs < ofs:
+            m = last_ofs + ((ofs - last_ofs) >> 1)
+            yield STEP_COMPARE, key_at, shown + m
+            if lt(key, a[base + m]):
+                ofs = m
+            else:
+                last_ofs = m + 1
+        return ofs
+
+    # Merges two adjacent runs with the shorter left run copied out; lst[base2] is known to come
+    # before lst[base1] and the last element of run 1 after all of run 2.
+    def merge_lo(base1, len1, base2, len2):
+        nonlocal min_gallop
+        tmp = list(lst[base1: base1 + len1])
+        cursor1, cursor2, dest = 0, base2, base1
+        lst[dest] = lst[cursor2]
+        yield STEP_WRITE, dest, lst[dest]
+        dest, cursor2, len2 = dest + 1, cursor2 + 1, len2 - 1
+
+        while len2 and len1 > 1:
+            count1 = count2 = 0
+            # One element at a time until one run wins min_gallop times in a row.
+            while len2 and len1 > 1 and (count1 | count2) < min_gallop:
+                yield STEP_COMPARE, cursor2, dest
+                if lt(lst[cursor2], tmp[cursor1]):
+                    lst[dest] = lst[cursor2]
+                    cursor2, len2, count2, count1 = cursor2 + 1, len2 - 1, count2 + 1, 0
+                else:
+                    lst[dest] = tmp[cursor1]
+                    cursor1, len1, count1, count2 = cursor1 + 1, len1 - 1, count1 + 1, 0
+                yield STEP_WRITE, dest, lst[dest]
+                dest += 1
+            if not len2 or len1 <= 1:
+                break
+
+            # Galloping: find how long each run keeps winning and move that whole block at once.
+            while True:
+                count1 = yield from gallop_right(lst[cursor2], cursor2, tmp, cursor1, len1, 0, dest)
+                if count1:
+                    yield from copy_into(dest, tmp, cursor1, count1)
+                    dest, cursor1, len1 = dest + count1, cursor1 + count1, len1 - count1
+                    if len1 <= 1:
+                        break
+                lst[dest] = lst[cursor2]
+                yield STEP_WRITE, dest, lst[dest]
+                dest, cursor2, len2 = dest + 1, cursor2 + 1, len2 - 1
+                if not len2:
+                    break
+
+                count2 = yield from gallop_left(tmp[cursor1], dest, lst, cursor2, len2, 0, cursor2)
+                if count2:
+                    yield from copy_into(dest, lst, cursor2, count2)
+                    dest, cursor2, len2 = dest + count2, cursor2 + count2, len2 - count2
+                    if not len2:
+                        break
+                lst[dest] = tmp[cursor1]
+                yield STEP_WRITE, dest, lst[dest]
+                dest, cursor1, len1 = dest + 1, cursor1 + 1, len1 - 1
+                if len1 == 1:
+                    break
+
+                min_gallop -= 1
+                if count1 < MIN_GALLOP and count2 < MIN_GALLOP:
+                    break
+            if not len2 or len1 <= 1:
+                break
+            min_gallop = max(min_gallop, 0) + 2  # galloping didn't pay off, make it harder to re-enter
+
+        if len1 == 1:
+            yield from copy_into(dest, lst, cursor2, len2)
+            lst[dest + len2] = tmp[cursor1]
+            yield STEP_WRITE, dest + len2, lst[dest + len2]
+        else:
+            yield from copy_into(dest, tmp, cursor1, len1)
+
+    # Mirror image of merge_lo for a shorter right run, merging from the top end down.
+    def merge_hi(base1, len1, base2, len2):
+        nonlocal min_gallop
+        tmp = list(lst[base2: base2 + len2])
+        cursor1, cursor2, dest = base1 + len1 - 1, len2 - 1, base2 + len2 - 1
+        lst[dest] = lst[cursor1]
+        yield STEP_WRITE, dest, lst[dest]
+        dest, cursor1, len1 = dest - 1, cursor1 - 1, len1 - 1
+
+        while len1 and len2 > 1:
+            count1 = count2 = 0
+            while len1 and len2 > 1 and (count1 | count2) < min_gallop:
+                yield STEP_COMPARE, cursor1, dest
+                if lt(tmp[cursor2], lst[cursor1]):
+                    lst[dest] = lst[cursor1]
+                    cursor1, len1, count1, count2 = cursor1 - 1, len1 - 1, count1 + 1, 0
+                else:
+                    lst[dest] = tmp[cursor2]
+                    cursor2, len2, count2, count1 = cursor2 - 1, len2 - 1, count2 + 1, 0
+                yield STEP_WRITE, dest, lst[dest]
+                dest -= 1
+            if not len1 or len2 <= 1:
+                break
+
+            while True:
+                k = yield from gallop_right(tmp[cursor2], dest, lst, base1, len1, len1 - 1, base1)
+                count1 = len1 - k
+                if count1:
+                    dest, cursor1, len1 = dest - count1, cursor1 - count1, len1 - count1
+                    yield from copy_into(dest + 1, lst, cursor1 + 1, count1)
+                    if not len1:
+                        break
+                lst[dest] = tmp[cursor2]
+                yield STEP_WRITE, dest, lst[dest]
+                dest, cursor2, len2 = dest - 1, cursor2 - 1, len2 - 1
+                if len2 == 1:
+                    break
+
+                k = yield from gallop_left(lst[cursor1], cursor1, tmp, 0, len2, len2 - 1, base2)
+                count2 = len2 - k
+                if count2:
+                    dest, cursor2, len2 = dest - count2, cursor2 - count2, len2 - count2
+                    yield from copy_into(dest + 1, tmp, cursor2 + 1, count2)
+                    if len2 <= 1:
+                        break
+                lst[dest] = lst[cursor1]
+                yield STEP_WRITE, dest, lst[dest]
+                dest, cursor1, len1 = dest - 1, cursor1 - 1, len1 - 1
+                if not len1:
+                    break
+
+                min_gallop -= 1
+                if count1 < MIN_GALLOP and count2 < MIN_GALLOP:
+                    break
+            if not len1 or len2 <= 1:
+                break
+            min_gallop = max(min_gallop, 0) + 2
+
+        if len2 == 1:
+            dest, cursor1 = dest - len1, cursor1 - len1
+            yield from copy_into(dest + 1, lst, cursor1 + 1, len1)
+            lst[dest] = tmp[cursor2]
+            yield STEP_WRITE, dest, lst[dest]
+        else:
+            yield from copy_into(dest - len2 + 1, tmp, 0, len2)
+
+    def merge_at(i):
+        base1, len1 = runs[i]
+        base2, len2 = runs[i + 1]
+        runs[i] = (base1, len1 + len2)
+        del runs[i + 1]
+
+        # Elements of run 1 already before all of run 2, and of run 2 after all of run 1, stay put.
+        k = yield from gallop_right(lst[base2], base2, lst, base1, len1, 0, base1)
+        base1, len1 = base1 + k, len1 - k
+        if len1:
+            len2 = yield from gallop_left(lst[base1 + len1 - 1], base1 + len1 - 1, lst, base2, len2, len2 - 1, base2)
+            if len2:
+                if len1 <= len2:
+                    yield from merge_lo(base1, len1, base2, len2)
+                else:
+                    yield from merge_hi(base1, len1, base2, len2)
+        yield STEP_DONE, runs[i][0], runs[i][0] + runs[i][1] - 1
+
+    # Keeps run lengths growing at least like the Fibonacci numbers from the top of the stack down.
+    def merge_collapse():
+        while len(runs) > 1:
+            i = len(runs) - 2
+            if (i > 0 and runs[i - 1][1] <= runs[i][1] + runs[i + 1][1]) or \
+                    (i > 1 and runs[i - 2][1] <= runs[i - 1][1] + runs[i][1]):
+                if runs[i - 1][1] < runs[i + 1][1]:
+                    i -= 1
+            elif runs[i][1] > runs[i + 1][1]:
+                break
+            yield from merge_at(i)
+
+    def merge_force_collapse():
+        while len(runs) > 1:
+            i = len(runs) - 2
+            if i > 0 and runs[i - 1][1] < runs[i + 1][1]:
+                i -= 1
+            yield from merge_at(i)
+
+    if n < 2:
+        return lst
+    min_run = min_run_length(n)
+    lo = 0
+    while lo < n:
+        run_length = yield from count_run(lo, n)
+        if run_length < min_run:
+            forced = min(n - lo, min_run)
+            yield from binary_insertion_sort(lo, lo + forced, lo + run_length)
+            run_length = forced
+        runs.append((lo, run_length))
+        yield from merge_collapse()
+        lo += run_length
+    yield from merge_force_collapse()
+    return lst
+
+
+# Introsort: median-of-three quicksort that switches to heap sort on a range once the partitions
+# have gone 2*log2(n) levels deep, and finishes small ranges with insertion sort. The larger side
+# of each partition goes on an explicit stack so the stack never grows past O(log n).
+INTROSORT_THRESHOLD = 16
+
+
+def introsort(lst, ascending=True):
+
+    def before(a, b):
+        return a < b if ascending else a > b
+
+    def swap(i, j):
+        lst[i], lst[j] = lst[j], lst[i]
+
+    def sift_down(lo, root, size):
+        while True:
+            child = 2 * root + 1
+            if child >= size:
+                return
+            if child + 1 < size:
+                yield STEP_COMPARE, lo + child, lo + child + 1
+                if before(lst[lo + child], lst[lo + child + 1]):
+                    child += 1
+            yield STEP_COMPARE, lo + root, lo + child
+            if not before(lst[lo + root], lst[lo + child]):
+                return
+            swap(lo + root, lo + child)
+            yield STEP_SWAP, lo + root, lo + child
+            root = child
+
+    def heap_sort_range(lo, hi):
+        size = hi - lo + 1
+        for root in range(size // 2 - 1, -1, -1):
+            yield from sift_down(lo, root, size)
+        for end in range(size - 1, 0, -1):
+            swap(lo, lo + end)
+            yield STEP_SWAP, lo, lo + end
+            yield from sift_down(lo, 0, end)
+
+    # Orders lst[lo], lst[mid], lst[hi] and parks the median at hi - 1 as the pivot, leaving sentinels
+    # at both ends so the partition scans need no bounds checks.
+    def median_of_three(lo, hi):
+        mid = (lo + hi) // 2
+        for i, j in ((lo, mid), (mid, hi), (lo, mid)):
+            yield STEP_COMPARE, i, j
+            if before(lst[j], lst[i]):
+                swap(i, j)
+                yield STEP_SWAP, i, j
+        swap(mid, hi - 1)
+        yield STEP_SWAP, mid, hi - 1
+
+    # Hoare-style partition: both scans stop on elements equal to the pivot, so runs of duplicates
+    # still split down the middle instead of degrading to quadratic time.
+    def partition(lo, hi):
+        yield from median_of_three(lo, hi)
+        pivot = lst[hi - 1]
+        yield STEP_PIVOT, hi - 1, hi - 1
+        i, j = lo, hi - 1
+        while True:
+            i += 1
+            yield STEP_COMPARE, i, hi - 1
+            while before(lst[i], pivot):
+                i += 1
+                yield STEP_COMPARE, i, hi - 1
+            j -= 1
+            yield STEP_COMPARE, j, hi - 1
+            while before(pivot, lst[j]):
+                j -= 1
+                yield STEP_COMPARE, j, hi - 1
+            if i >= j:
+                break
+            swap(i, j)
+            yield STEP_SWAP, i, j
+        swap(i, hi - 1)
+        yield STEP_SWAP, i, hi - 1
+        yield STEP_DONE, i, i
+        return i
+
+    n = len(lst)
+    stack = [(0, n - 1, 2 * max(n, 1).bit_length())]
+    while stack:
+        lo, hi, depth = stack.pop()
+        while hi - lo + 1 > INTROSORT_THRESHOLD and depth:
+            depth -= 1
+            p = yield from partition(lo, hi)
+            if p - lo < hi - p:
+                stack.append((p + 1, hi, depth))
+                hi = p - 1
+            else:
+                stack.append((lo, p - 1, depth))
+                lo = p + 1
+        if hi - lo + 1 > INTROSORT_THRESHOLD:
+            yield from heap_sort_range(lo, hi)
+        else:
+            yield from insertion_sort_range(lst, lo, hi, ascending)
+        yield STEP_DONE, lo, hi
+    return lst
+
+
+# Radix sorts work on value - min, one base-10 digit at a time, so negative numbers are fine too.
+RADIX_BASE = 10
+
+
+def lsd_radix_sort(lst, ascending=True):
+    n = len(lst)
+    if n < 2:
+        return lst
+    low = min(lst)
+    span = max(lst) - low
+    buckets = range(RADIX_BASE) if ascending else range(RADIX_BASE - 1, -1, -1)
+
+    exp = 1
+    while span // exp:
+        # One stable counting-sort pass on the current digit, least significant first.
+        counts = [0] * RADIX_BASE
+        for value in lst:
+            counts[(value - low) // exp % RADIX_BASE] += 1
+        starts = [0] * RADIX_BASE
+        total = 0
+        for digit in buckets:
+            starts[digit] = total
+            total += counts[digit]
+        output = [None] * n
+        for value in lst:
+            digit = (value - low) // exp % RADIX_BASE
+            output[starts[digit]] = value
+            starts[digit] += 1
+        for i, value in enumerate(output):
+            lst[i] = value
+            yield STEP_WRITE, i, value
+        exp *= RADIX_BASE
+    return lst
+
+
+# MSD radix sort: distributes by the most significant digit, then sorts every bucket by the next digit,
+# handing buckets of INTROSORT_THRESHOLD elements or fewer to insertion sort.
+def msd_radix_sort(lst, ascending=True):
+    n = len(lst)
+    if n < 2:
+        return lst
+    low = min(lst)
+    span = max(lst) - low
+    buckets = range(RADIX_BASE) if ascending else range(RADIX_BASE - 1, -1, -1)
+    exp = 1
+    while span // exp >= RADIX_BASE:
+        exp *= RADIX_BASE
+
+    stack = [(0, n, exp)]
+    while stack:
+        lo, hi, exp = stack.pop()
+        if hi - lo <= INTROSORT_THRESHOLD:
+            yield from insertion_sort_range(lst, lo, hi - 1, ascending)
+            yield STEP_DONE, lo, hi - 1
+            continue
+
+        items = list(lst[lo:hi])
+        counts = [0] * RADIX_BASE
+        for value in items:
+            counts[(value - low) // exp % RADIX_BASE] += 1
+        starts = [0] * RADIX_BASE
+        total = lo
+        for digit in buckets:
+            starts[digit] = total
+            total += counts[digit]
+        ranges = [(starts[digit], starts[digit] + counts[digit]) for digit in buckets]
+        for value in items:
+            digit = (value - low) // exp % RADIX_BASE
+            lst[starts[digit]] = value
+            yield STEP_WRITE, starts[digit], value
+            starts[digit] += 1
+
+        for start, end in reversed(ranges):
+            if end - start > 1 and exp > 1:
+                stack.append((start, end, exp // RADIX_BASE))
+            elif end > start:
+                yield STEP_DONE, start, end - 1
+    return lst
+
+
+# Widest value range counting_sort tallies, as a multiple of the list length; COUNTING_MIN_RANGE is always allowed.
+COUNTING_RANGE_FACTOR = 16
+COUNTING_MIN_RANGE = 1 << 16
+
+
+# Counting sort: tallies every value in min..max and writes them back in order. Linear in
+# n + (max - min), which makes it the fastest choice for the small 0-100 range of the visualizer.
+# A range much wider than the list would need a counter per value (int64 data can't be allocated at
+# all), so those lists are handed to the LSD radix sort, which is linear in n whatever the range.
+def counting_sort(lst, ascending=True):
+    if len(lst) < 2:
+        return lst
+    low = min(lst)
+    span = max(lst) - low + 1
+    if span > max(COUNTING_RANGE_FACTOR * len(lst), COUNTING_MIN_RANGE):
+        return (yield from lsd_radix_sort(lst, ascending))
+    counts = [0] * span
+    for value in lst:
+        counts[value - low] += 1
+
+    i = 0
+    for offset in (range(len(counts)) if ascending else range(len(counts) - 1, -1, -1)):
+        for _ in range(counts[offset]):
+            lst[i] = low + offset
+            yield STEP_WRITE, i, lst[i]
+            i += 1
+    return lst
+
+
+# Parallel sorts: the values are copied into shared memory once and a pool of worker processes sorts
+# and merges index ranges of it in place, so a task only carries indices. After every phase the
+# generator copies the result back into lst as writes, and each range it hands out is announced
+# with a RANGE step so the visualizer can tint it in that worker's color.
+PARALLEL_WORKERS = cpu_count() or 1
+# Fewer workers are used when a list is too short to give each of them this many elements.
+PARALLEL_MIN_CHUNK = 4
+# Sample sort picks its splitters from this many random samples per bucket.
+OVERSAMPLING = 16
+
+# The running parallel sort's shared arrays, as seen from a worker; set by attach_shared.
+shared_values = None
+shared_buffer = None
+
+
+def attach_shared(values, buffer):
+    global shared_values, shared_buffer
+    shared_values = values
+    shared_buffer = buffer
+
+
+# Daemonic processes (such as race lanes) can't have children, so they and single-worker runs
+# do the work in-process, which is also the baseline the benchmark's speedup is measured against.
+def open_pool(workers, values, buffer):
+    if workers == 1 or multiprocessing.current_process().daemon:
+        attach_shared(values, buffer)
+        return None
+    return multiprocessing.Pool(workers, initializer=attach_shared, initargs=(values, buffer))
+
+
+# The workers inherit pygame's SIGTERM handler and may not die on terminate(), so let them exit normally.
+def close_pool(pool):
+    attach_shared(None, None)
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+
+def run_parallel(pool, function, jobs):
+    if pool is None:
+        return [function(job) for job in jobs]
+    return pool.map(function, jobs)
+
+
+def shared_int64(lst):
+    values = multiprocessing.RawArray('q', len(lst))
+    memoryview(values).cast('B').cast('q')[:] = array('q', lst)
+    return values
+
+
+# Writes values[lo:hi] into lst wherever they differ, as steps.
+def copy_back(lst, values, lo, hi):
+    for i, value in enumerate(values[lo:hi], lo):
+        if lst[i] != value:
+            lst[i] = value
+            yield STEP_WRITE, i, value
+
+
+# Serial kernels run by the workers on plain lists; the merge is stable.
+def merge_values(left, right, ascending=True):
+    merged = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if right[j] < left[i] if ascending else right[j] > left[i]:
+            merged.append(right[j])
+            j += 1
+        else:
+            merged.append(left[i])
+            i += 1
+    merged.extend(left[i:])
+    merged.extend(right[j:])
+    return merged
+
+
+def merge_sort_values(values, ascending=True):
+    if len(values) < 2:
+        return values
+    mid = len(values) // 2
+    return merge_values(merge_sort_values(values[:mid], ascending), merge_sort_values(values[mid:], ascending),
+                        ascending)
+
+
+# Worker tasks, (lo, hi, ...) ranges of the shared values.
+def sort_shared_range(job):
+    lo, hi, ascending = job
+    shared_values[lo:hi] = merge_sort_values(shared_values[lo:hi], ascending)
+
+
+def merge_shared_ranges(job):
+    lo, mid, hi, ascending = job
+    shared_values[lo:hi] = merge_values(shared_values[lo:mid], shared_values[mid:hi], ascending)
+
+
+def count_buckets(job):
+    lo, hi, splitters = job
+    counts = [0] * (len(splitters) + 1)
+    for value in shared_values[lo:hi]:
+        counts[bisect_right(splitters, value)] += 1
+    return counts
+
+
+# starts[b] is where this chunk's first element of bucket b goes in the shared buffer.
+def scatter_buckets(job):
+    lo, hi, splitters, starts = job
+    for value in shared_values[lo:hi]:
+        bucket = bisect_right(splitters, value)
+        shared_buffer[starts[bucket]] = value
+        starts[bucket] += 1
+
+
+def worker_count(n, workers):
+    return max(1, min(workers or PARALLEL_WORKERS, n // PARALLEL_MIN_CHUNK))
+
+
+def split_range(n, parts):
+    bounds = [n * k // parts for k in range(parts + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+
+# Parallel merge sort: every worker sorts one contiguous chunk, then neighbouring chunks are merged
+# pairwise in a tree, so log2(workers) merge rounds finish the job.
+def parallel_merge_sort(lst, ascending=True, workers=None):
+    n = len(lst)
+    if n < 2:
+        return lst
+    workers = worker_count(n, workers)
+    values = shared_int64(lst)
+    pool = open_pool(workers, values, None)
+    try:
+        ranges = split_range(n, workers)
+        for lo, hi in ranges:
+            yield STEP_RANGE, lo, hi - 1
+        run_parallel(pool, sort_shared_range, [(lo, hi, ascending) for lo, hi in ranges])
+        yield from copy_back(lst, values, 0, n)
+
+        while len(ranges) > 1:
+            merges = [(ranges[k][0], ranges[k][1], ranges[k + 1][1]) for k in range(0, len(ranges) - 1, 2)]
+            for lo, _, hi in merges:
+                yield STEP_RANGE, lo, hi - 1
+            run_parallel(pool, merge_shared_ranges, [(lo, mid, hi, ascending) for lo, mid, hi in merges])
+            yield from copy_back(lst, values, 0, merges[-1][2])
+            ranges = [(lo, hi) for lo, _, hi in merges] + ranges[2 * len(merges):]
+    finally:
+        close_pool(pool)
+    yield STEP_DONE, 0, n - 1
+    return lst
+
+
+# Parallel sample sort: sorted random samples give workers - 1 splitters, every worker counts and
+# then scatters its chunk into the value buckets those splitters define, and each bucket is sorted
+# by one worker. No merging is needed because the buckets already come out in order.
+def parallel_sample_sort(lst, ascending=True, workers=None):
+    n = len(lst)
+    if n < 2:
+        return lst
+    workers = worker_count(n, workers)
+    values = shared_int64(lst)
+    buffer = multiprocessing.RawArray('q', n)
+    sample = sorted(values[i] for i in random.Random(n).sample(range(n), min(n, workers * OVERSAMPLING)))
+    splitters = [sample[len(sample) * k // workers] for k in range(1, workers)]
+
+    pool = open_pool(workers, values, buffer)
+    try:
+        chunks = split_range(n, workers)
+        for lo, hi in chunks:
+            yield STEP_RANGE, lo, hi - 1
+        counts = run_parallel(pool, count_buckets, [(lo, hi, splitters) for lo, hi in chunks])
+
+        # Bucket b of chunk c goes after every bucket that sorts before b and after bucket b of earlier chunks.
+        starts = [[0] * workers for _ in chunks]
+        buckets = []
+        position = 0
+        for bucket in (range(workers) if ascending else range(workers - 1, -1, -1)):
+            first = position
+            for c in range(len(chunks)):
+                starts[c][bucket] = position
+                position += counts[c][bucket]
+            buckets.append((first, position))
+        run_parallel(pool, scatter_buckets, [(lo, hi, splitters, starts[c]) for c, (lo, hi) in enumerate(chunks)])
+        memoryview(values).cast('B')[:] = memoryview(buffer).cast('B')
+
+        buckets = [(lo, hi) for lo, hi in buckets if hi > lo]
+        for lo, hi in buckets:
+            yield STEP_RANGE, lo, hi - 1
+        yield from copy_back(lst, values, 0, n)
+        run_parallel(pool, sort_shared_range, [(lo, hi, ascending) for lo, hi in buckets])
+        yield from copy_back(lst, values, 0, n)
+    finally:
+        close_pool(pool)
+    yield STEP_DONE, 0, n - 1
+    return lst
+
+
+class Algorithm:
+    """An entry of the algorithm registry: a sorting generator and what the tools need to know about it.
+
+    `signature` is "list" for generators called as function(lst, ascending) and "range" for ones that take
+    the inclusive bounds to sort, function(lst, left, right, ascending). `key` is the letter that picks the
+    algorithm in the visualizer's keyboard mode, `label` its button text (the name by default), `complexity`
+    its (best, average, worst, space) bounds and `sound` the file looped while it runs. Parallel sorts also
+    take a worker count after `ascending`.
+    """
+
+    def __init__(self, name, function, key=None, label=None, signature="list", complexity=None, sound=None,
+                 parallel=False):
+        if signature not in ("list", "range"):
+            raise ValueError(f"{name}: unknown signature {signature!r}")
+        self.name = name
+        self.function = function
+        self.key = key
+        self.label = label or name
+        self.signature = signature
+        self.complexity = complexity
+        self.sound = sound
+        self.parallel = parallel
+
+    def start(self, lst, ascending=True):
+        if self.signature == "range":
+            return self.function(lst, 0, len(lst) - 1, ascending)
+        return self.function(lst, ascending)
+
+
+# Every sort by name, in the order the visualizer shows them. The visualizer, race mode, export and the
+# benchmark all take their algorithms from here, so a new sort only needs its generator and a register() call.
+ALGORITHMS = {}
+# The registered sorts that take a worker count, for the benchmark's speedup curve.
+PARALLEL_ALGORITHMS = {}
+
+
+# Letters the visualizer's own controls use, which no algorithm can take.
+RESERVED_KEYS = frozenset("adefkruw")
+
+
+# Keys are single lowercase letters other than RESERVED_KEYS.
+def register(name, function, **details):
+    algorithm = Algorithm(name, function, **details)
+    if name in ALGORITHMS:
+        raise ValueError(f"{name} is already registered")
+    if algorithm.key is not None and not (len(algorithm.key) == 1 and "a" <= algorithm.key <= "z"):
+        raise ValueError(f"{name}: key {algorithm.key!r} is not a single lowercase letter")
+    if algorithm.key in RESERVED_KEYS:
+        raise ValueError(f"{name}: key {algorithm.key!r} is one of the visualizer's controls")
+    if algorithm.key is not None and any(other.key == algorithm.key for other in ALGORITHMS.values()):
+        raise ValueError(f"{name}: key {algorithm.key!r} is already taken")
+    ALGORITHMS[name] = algorithm
+    if algorithm.parallel:
+        PARALLEL_ALGORITHMS[name] = algorithm
+    return algorithm
+
+
+register("Bubble Sort", bubble_sort, key="b", complexity=("O(n)", "O(n²)", "O(n²)", "O(1)"), sound="Bubble.mp3")
+register("Insertion Sort", insertion_sort, key="i", complexity=("O(n)", "O(n²)", "O(n²)", "O(1)"),
+         sound="insertion.mp3")
+register("Selection Sort", selection_sort, key="s", complexity=("O(n²)", "O(n²)", "O(n²)", "O(1)"),
+         sound="selection.mp3")
+register("Merge Sort", merge_sort, key="m", signature="range",
+         complexity=("O(n log n)", "O(n log n)", "O(n log n)", "O(n)"))
+register("Quick Sort", quick_sort, key="q", complexity=("O(n log n)", "O(n log n)", "O(n²)", "O(log n)"),
+         sound="quick.mp3")
+register("Cocktail Shaker Sort", cocktail_shaker_sort, key="x", label="Shaker Sort",
+         complexity=("O(n)", "O(n²)", "O(n²)", "O(1)"), sound="shaker.mp3")
+register("Heap Sort", heap_sort, key="h", complexity=("O(n log n)", "O(n log n)", "O(n log n)", "O(1)"),
+         sound="heap.mp3")
+register("Timsort", timsort, key="t", complexity=("O(n)", "O(n log n)", "O(n log n)", "O(n)"))
+register("Introsort", introsort, key="n", complexity=("O(n log n)", "O(n log n)", "O(n log n)", "O(log n)"))
+register("LSD Radix Sort", lsd_radix_sort, key="l", complexity=("O(d·n)", "O(d·n)", "O(d·n)", "O(n + b)"))
+register("MSD Radix Sort", msd_radix_sort, key="o", complexity=("O(d·n)", "O(d·n)", "O(d·n)", "O(n + d·b)"))
+register("Counting Sort", counting_sort, key="c", complexity=("O(n + k)", "O(n + k)", "O(n + k)", "O(k)"))
+register("Parallel Merge Sort", parallel_merge_sort, key="p", parallel=True,
+         complexity=("O(n log n / p + n)", "O(n log n / p + n)", "O(n log n / p + n)", "O(n)"))
+register("Parallel Sample Sort", parallel_sample_sort, key="g", parallel=True,
+         complexity=("O(n log n / p)", "O(n log n / p)", "O(n log n)", "O(n)"))
@@ -1,10 +1,32 @@
+from collections import OrderedDict, deque
 from os import environ
-import pygame
+from os.path import splitext
 import random
 import math
+import time
+import argparse
+import csv
+import mmap
+import struct
+import multiprocessing
+import threading
+from array import array
 
 environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
-pygame.init()
+import pygame
+
+# The sorts and their registry live in sorting.py, which doesn't need pygame.
+from sorting import (ALGORITHMS, STEP_COMPARE, STEP_DONE, STEP_NAMES, STEP_PIVOT, STEP_RANGE, STEP_SWAP, STEP_WRITE,
+                     Instrumentation, ResultCache, StepTrace, apply_step, load_values, record_steps, replay_steps,
+                     result_key, start_sort)
+from datasets import SHAPES, generate, load_file, make_rng
+from external import RUN_LENGTH, ExternalSort
+from searching import SEARCHES, SortedIndex, queries_per_second, rate_label, sorted_direction
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class DrawInformation:
@@ -15,70 +37,314 @@ class DrawInformation:
     T_COLOR = 150, 121, 105
     LF_COLOR = 196, 164, 132
     SO_COLOR = 128, 0, 0
+    COMPARE_COLOR = 173, 216, 230
     BACKGROUND_COLOR = WHITE
 
+    # Tints for the ranges the parallel sorts hand to their workers, used in turn.
+    WORKER_COLORS = [
+        (244, 164, 96),
+        (100, 149, 237),
+        (186, 85, 211),
+        (218, 165, 32),
+        (205, 92, 92),
+        (72, 61, 139),
+        (46, 139, 87),
+        (199, 21, 133)
+    ]
+
     GRADIENTS = [
         (128, 128, 128),
         (160, 160, 160),
         (192, 192, 192)
     ]
 
-    FONT = pygame.font.SysFont('Segoe script', 14)
-    LARGE_FONT = pygame.font.SysFont('Lucida Handwriting', 16)
-    TITLE_FONT = pygame.font.SysFont('Stencil', 36)
+    # Looked up by load_fonts() when the first DrawInformation is made, not when the module is imported.
+    FONT = None
+    LARGE_FONT = None
+    TITLE_FONT = None
+    BUTTON_FONT = None
 
     SIDE_PAD = 100
     TOP_PAD = 150
 
-    def __init__(self, width, height, lst):
+    # How the values are stored: a plain list, an array('q') buffer, or a NumPy int64 array.
+    # Both buffer kinds are drawn with the vectorized renderer, which needs NumPy.
+    BACKINGS = ("list", "array", "numpy")
+
+    # window is normally created here; pass a surface (e.g. a subsurface of the screen) to draw into that instead.
+    def __init__(self, width, height, lst, backing="list", window=None):
         self.width = width
         self.height = height
-
-        self.window = pygame.display.set_mode((width, height))
-        pygame.display.set_caption("Sorting Algorithm Visualization")
+        self.backing = backing
+        self.vectorized = backing != "list"
+        self.plot_surface = None
+        # Pre-rendered title, controls and buttons, and what they were drawn for (see header_layer).
+        self.header = None
+        self.header_key = None
+        # Steps taken by advance_sort on this window so far, which the performance overlay turns into a rate.
+        self.step_count = 0
+        # The main loop's FrameTimer, which update_display reports to, and whether the overlay is shown.
+        self.perf = None
+        self.show_perf = False
+        # The performance overlay's last panel and the frame it was built in (see draw_perf_overlay).
+        self.perf_panel = None
+        self.perf_panel_frame = 0
+
+        if DrawInformation.FONT is None:
+            load_fonts()
+        if window is None:
+            window = pygame.display.set_mode((width, height))
+            pygame.display.set_caption("Sorting Algorithm Visualization")
+        self.window = window
         self.set_list(lst)
 
     def set_list(self, lst):
+        self.lst = to_backing(lst, self.backing)
+        if self.backing == "numpy":
+            self.min_val = int(self.lst.min())
+            self.max_val = int(self.lst.max())
+        else:
+            self.min_val = min(self.lst)
+            self.max_val = max(self.lst)
+        if self.max_val == self.min_val:
+            self.min_val -= 1  # a list of equal values is drawn full height instead of dividing by a zero range
+
+        plot_width = self.width - self.SIDE_PAD
+        # With more values than pixel columns, each column summarizes the values under it and is one pixel wide.
+        self.columns = ColumnSummary(self.lst, plot_width) if len(self.lst) > plot_width else None
+        self.block_width = max(plot_width // len(self.lst), 1)
+        self.block_height = (self.height - self.TOP_PAD) / (self.max_val - self.min_val)
+        if self.block_height >= 1:
+            self.block_height = math.floor(self.block_height)  # whole pixels unless the plot is shorter than the range
+        # Whole-pixel bars rarely fill the plot exactly, so they are centered in it.
+        self.start_x = self.SIDE_PAD // 2 + (plot_width - min(len(self.lst), plot_width) * self.block_width) // 2
+
+        # (value, color) of every bar, or column_shape() of every column, as it is currently on screen.
+        # None forces a full redraw, which also summarizes the columns again from the whole list.
+        self.drawn = None
+        # Indices whose value may have changed since the last frame, and the bars highlighted in it.
+        self.touched = set()
+        self.highlighted = set()
+        self.hud_text = None
+        # Per-bar gradient colors for the vectorized renderer, built once per list.
+        self.bar_colors = None
+        # (first, last, color) of every range currently owned by a parallel sort's worker.
+        self.ranges = []
+        self.range_count = 0
+        # SortedIndex over the list for searching, built on the first search after the list last changed.
+        self.search_index = None
+
+    def plot_rect(self):
+        return pygame.Rect(self.SIDE_PAD // 2, self.TOP_PAD, self.width - self.SIDE_PAD, self.height - self.TOP_PAD)
+
+    def bar_column(self, i):
+        x = self.start_x + i * self.block_width
+        return pygame.Rect(x, self.TOP_PAD, self.block_width, self.height - self.TOP_PAD)
+
+
+class ColumnSummary:
+    """Smallest, largest and mean value under each pixel column of a list longer than the plot is wide.
+
+    Column c covers indices -(-c * n // columns) up to the next column's first index. refresh() summarizes
+    the whole list; after that update() takes just the indices that changed. It keeps a copy of the values
+    as last seen, so a changed value moves its column's sum and extreme counts straight away, and a column is
+    only scanned again when the last copy of its minimum or maximum has left it. Keeping the summary current
+    therefore costs about as much as the number of changed values, whatever len(lst) is.
+    """
+
+    def __init__(self, lst, columns):
         self.lst = lst
-        self.min_val = min(lst)
-        self.max_val = max(lst)
-
-        self.block_width = round((self.width - self.SIDE_PAD) / len(lst))
-        self.block_height = math.floor((self.height - self.TOP_PAD) / (self.max_val - self.min_val))
-        self.start_x = self.SIDE_PAD // 2
-
-
-def draw_buttons(draw_info, buttons):
+        self.n = len(lst)
+        self.columns = columns
+        self.starts = [-(-c * self.n // columns) for c in range(columns + 1)]
+        self.shadow = None
+
+    def column(self, i):
+        return i * self.columns // self.n
+
+    def refresh(self):
+        if numpy is not None:
+            values = numpy.asarray(as_numpy(self.lst), dtype=numpy.int64)
+            starts = numpy.array(self.starts[:-1])
+            widths = numpy.diff(self.starts)
+            low = numpy.minimum.reduceat(values, starts)
+            high = numpy.maximum.reduceat(values, starts)
+            self.low, self.high = low.tolist(), high.tolist()
+            self.sums = numpy.add.reduceat(values, starts).tolist()
+            self.low_count = numpy.add.reduceat((values == low.repeat(widths)).astype(numpy.int64), starts).tolist()
+            self.high_count = numpy.add.reduceat((values == high.repeat(widths)).astype(numpy.int64), starts).tolist()
+            self.shadow = array('q', values.tobytes())
+            return
+        self.shadow = array('q', self.lst)
+        self.low, self.high, self.sums = [0] * self.columns, [0] * self.columns, [0] * self.columns
+        self.low_count, self.high_count = [0] * self.columns, [0] * self.columns
+        for c in range(self.columns):
+            self.scan(c)
+
+    def scan(self, c):
+        values = self.shadow[self.starts[c]: self.starts[c + 1]]
+        self.low[c], self.high[c], self.sums[c] = min(values), max(values), sum(values)
+        self.low_count[c], self.high_count[c] = values.count(self.low[c]), values.count(self.high[c])
+
+    # Takes in the current values at indices and returns the columns whose summary changed.
+    def update(self, indices):
+        lst, shadow, low, high = self.lst, self.shadow, self.low, self.high
+        changed = set()
+        rescan = set()
+        for i in indices:
+            value = int(lst[i])
+            old = shadow[i]
+            if value == old:
+                continue
+            shadow[i] = value
+            c = i * self.columns // self.n
+            changed.add(c)
+            self.sums[c] += value - old
+
+            if old == low[c]:
+                self.low_count[c] -= 1
+            if value < low[c]:
+                low[c], self.low_count[c] = value, 1
+            elif value == low[c]:
+                self.low_count[c] += 1
+            elif self.low_count[c] <= 0:
+                rescan.add(c)
+
+            if old == high[c]:
+                self.high_count[c] -= 1
+            if value > high[c]:
+                high[c], self.high_count[c] = value, 1
+            elif value == high[c]:
+                self.high_count[c] += 1
+            elif self.high_count[c] <= 0:
+                rescan.add(c)
+        for c in rescan:
+            self.scan(c)
+        return changed
+
+    def mean(self, c):
+        return self.sums[c] / (self.starts[c + 1] - self.starts[c])
+
+
+# SysFont searches the installed fonts, so only the font module is started and only once something is drawn.
+def load_fonts():
+    pygame.font.init()
+    DrawInformation.FONT = pygame.font.SysFont('Segoe script', 14)
+    DrawInformation.LARGE_FONT = pygame.font.SysFont('Lucida Handwriting', 16)
+    DrawInformation.TITLE_FONT = pygame.font.SysFont('Stencil', 36)
+    DrawInformation.BUTTON_FONT = pygame.font.SysFont('Lucida Handwriting', 24)
+
+
+# Rendered text by (font, text, color), so strings that stay the same from frame to frame are rendered once.
+# Least recently used entries are dropped past TEXT_CACHE_SIZE. Text that changes every frame, like the status
+# line, is rendered straight from the font instead, since it would only push the static labels out.
+TEXT_CACHE_SIZE = 512
+text_cache = OrderedDict()
+
+
+def render_text(font, text, color):
+    key = font, text, color
+    surface = text_cache.get(key)
+    if surface is None:
+        surface = text_cache[key] = font.render(text, True, color)
+        if len(text_cache) > TEXT_CACHE_SIZE:
+            text_cache.popitem(last=False)
+    else:
+        text_cache.move_to_end(key)
+    return surface
+
+
+def draw_buttons(surface, buttons):
     for button in buttons:
-        pygame.draw.rect(draw_info.window, button['color'], button['rect'])
-        text_surface = draw_info.FONT.render(button['text'], True, draw_info.BLACK)
-        draw_info.window.blit(text_surface, (button['rect'].x + 5, button['rect'].y + 5))
-
-
-def draw(draw_info, algo_name, ascending, buttons, show_controls=False):
-    draw_info.window.fill(draw_info.BACKGROUND_COLOR)
-
-    title = draw_info.TITLE_FONT.render(f"{algo_name} - {'Ascending' if ascending else 'Descending'}", 1,
-                                        draw_info.T_COLOR)
-    draw_info.window.blit(title, (draw_info.width / 2 - title.get_width() / 2, 5))
+        pygame.draw.rect(surface, button['color'], button['rect'])
+        text_surface = render_text(DrawInformation.FONT, button['text'], DrawInformation.BLACK)
+        surface.blit(text_surface, (button['rect'].x + 5, button['rect'].centery - text_surface.get_height() // 2))
+
+
+# One-line status strip between the controls and the bars, redrawn on its own while sorting.
+def draw_hud(draw_info, text, update=True):
+    hud_rect = pygame.Rect(0, draw_info.TOP_PAD - 20, draw_info.width, 20)
+    pygame.draw.rect(draw_info.window, draw_info.BACKGROUND_COLOR, hud_rect)
+    hud = draw_info.FONT.render(text, True, draw_info.BLACK)
+    draw_info.window.blit(hud, (10, hud_rect.y + 1))
+    draw_info.hud_text = text
+    if update:
+        update_display(draw_info, [hud_rect])
+
+
+# Everything above the status line (title, control lines and buttons) drawn onto one surface, which is
+# kept on draw_info and only drawn again when the title, direction or buttons change.
+def header_layer(draw_info, algo_name, ascending, buttons, show_controls):
+    key = (algo_name, ascending, show_controls,
+           [(button['text'], button['color'], tuple(button['rect'])) for button in buttons])
+    if draw_info.header is not None and draw_info.header_key == key:
+        return draw_info.header
+
+    header = pygame.Surface((draw_info.width, draw_info.TOP_PAD - 20), 0, draw_info.window)
+    header.fill(draw_info.BACKGROUND_COLOR)
+    center = draw_info.width // 2
+
+    title = render_text(draw_info.TITLE_FONT, f"{algo_name} - {'Ascending' if ascending else 'Descending'}",
+                        draw_info.T_COLOR)
+    header.blit(title, (center - title.get_width() // 2, 5))
 
     if show_controls:
-        controls = draw_info.LARGE_FONT.render("R - Reset | SPACE - Start Sorting | A - Ascending | D - Descending | "
-                                               "Size - + or - ", 1,
-                                               draw_info.LF_COLOR)
-        draw_info.window.blit(controls, (draw_info.width / 2 - controls.get_width() / 2, 45))
-
-        sorting = draw_info.FONT.render(
-            "I - Insertion | B - Bubble | S - Selection | M - Merge | Q - Quick | Shaker - X | Heap - H",
-            1, draw_info.SO_COLOR)
-        draw_info.window.blit(sorting, (draw_info.width / 2 - sorting.get_width() / 2, 75))
-
-    draw_list(draw_info)
-    draw_buttons(draw_info, buttons)
-    pygame.display.update()
+        controls = render_text(draw_info.LARGE_FONT, "R - Reset | SPACE - Start Sorting | A - Ascending | "
+                               "D - Descending | Size - + or - | U - Restore List | K - Search | TAB - Search Type",
+                               draw_info.LF_COLOR)
+        header.blit(controls, (center - controls.get_width() // 2, 45))
+
+        # The algorithm keys from the registry, seven to a line.
+        keyed = [algorithm for algorithm in ALGORITHMS.values() if algorithm.key]
+        for k in range(0, len(keyed), 7):
+            line = " | ".join(f"{algorithm.key.upper()} - {algorithm.label.removesuffix(' Sort')}"
+                              for algorithm in keyed[k: k + 7])
+            keys = render_text(draw_info.FONT, line, draw_info.SO_COLOR)
+            header.blit(keys, (center - keys.get_width() // 2, 75 + k // 7 * 25))
+
+    draw_buttons(header, buttons)
+    draw_info.header = header
+    draw_info.header_key = key
+    return header
+
+
+def draw(draw_info, algo_name, ascending, buttons, show_controls=False, hud_text="", highlight={}):
+    header = header_layer(draw_info, algo_name, ascending, buttons, show_controls)
+    draw_info.window.blit(header, (0, 0))
+    draw_info.window.fill(draw_info.BACKGROUND_COLOR, (0, header.get_height(), draw_info.width, draw_info.height))
+
+    draw_list(draw_info, highlight)
+    draw_hud(draw_info, hud_text, update=False)
+    update_display(draw_info)
+
+
+# Puts the window on the screen: all of it, or just rects. When the performance overlay is shown it is drawn
+# over the window first and pushed in the same update, so bars repainted under it never show without it.
+# The time spent is reported to draw_info.perf as the frame's flip time.
+def update_display(draw_info, rects=None):
+    if draw_info.show_perf:
+        overlay = draw_perf_overlay(draw_info, draw_info.perf)
+        if rects is not None:
+            rects = [*rects, overlay]
+    start = time.perf_counter()
+    if rects is None:
+        pygame.display.update()
+    else:
+        pygame.display.update(rects)
+    if draw_info.perf is not None:
+        draw_info.perf.flipped(time.perf_counter() - start)
 
 
 def draw_list(draw_info, color_positions={}, clear_bg=False):
+    if draw_info.columns is not None:
+        draw_columns(draw_info, color_positions, clear_bg)
+        return
+    if draw_info.vectorized:
+        draw_list_vectorized(draw_info, color_positions)
+        if clear_bg:
+            update_display(draw_info, [draw_info.plot_rect()])
+        return
+
     lst = draw_info.lst
 
     if clear_bg:
@@ -86,275 +352,1193 @@ def draw_list(draw_info, color_positions={}, clear_bg=False):
                       draw_info.width - draw_info.SIDE_PAD, draw_info.height - draw_info.TOP_PAD)
         pygame.draw.rect(draw_info.window, draw_info.BACKGROUND_COLOR, clear_rect)
 
+    drawn = []
     for i, val in enumerate(lst):
         x = draw_info.start_x + i * draw_info.block_width
         y = draw_info.height - (val - draw_info.min_val) * draw_info.block_height
 
-        color = draw_info.GRADIENTS[i % 3]
+        color = bar_color(draw_info, i) if draw_info.ranges else draw_info.GRADIENTS[i % 3]
 
         if i in color_positions:
             color = color_positions[i]
 
         pygame.draw.rect(draw_info.window, color, (x, y, draw_info.block_width, draw_info.height))
+        drawn.append((val, color))
 
-    if clear_bg:
-        pygame.display.update()
+    draw_info.drawn = drawn
+    draw_info.touched.clear()
+    draw_info.highlighted = set(color_positions)
 
+    if clear_bg:
+        update_display(draw_info, [draw_info.plot_rect()])
 
-def generate_starting_list(n, min_val, max_val):
-    lst = []
-    for _ in range(n):
-        val = random.randint(min_val, max_val)
-        lst.append(val)
-    return lst
 
+# Repaints only the bars whose value or color changed since the last frame and pushes
+# just those columns to the display. Only indices that were touched by a step or
+# highlighted in either frame are looked at, so the cost doesn't depend on len(lst).
+def draw_list_incremental(draw_info, color_positions={}):
+    if draw_info.drawn is None or draw_info.vectorized and draw_info.columns is None:
+        draw_list(draw_info, color_positions, True)
+        return
+    if draw_info.columns is not None:
+        draw_columns_incremental(draw_info, color_positions)
+        return
 
-def bubble_sort(draw_info, ascending=True):
     lst = draw_info.lst
-    for i in range(len(lst) - 1):
-        for j in range(len(lst) - 1 - i):
-            num1 = lst[j]
-            num2 = lst[j + 1]
+    drawn = draw_info.drawn
+    dirty_rects = []
+    for i in draw_info.touched | draw_info.highlighted | color_positions.keys():
+        val = lst[i]
+        if i in color_positions:
+            color = color_positions[i]
+        else:
+            color = bar_color(draw_info, i) if draw_info.ranges else draw_info.GRADIENTS[i % 3]
+        if drawn[i] == (val, color):
+            continue
+        drawn[i] = (val, color)
 
-            if (num1 > num2 and ascending) or (num1 < num2 and not ascending):
-                lst[j], lst[j + 1] = lst[j + 1], lst[j]
-                draw_list(draw_info, {j: draw_info.SEA_GREEN, j + 1: draw_info.PINK_PASTEL}, True)
-                yield True
-    return lst
+        column = draw_info.bar_column(i)
+        pygame.draw.rect(draw_info.window, draw_info.BACKGROUND_COLOR, column)
+        y = draw_info.height - (val - draw_info.min_val) * draw_info.block_height
+        pygame.draw.rect(draw_info.window, color, (column.x, y, column.width, draw_info.height - y))
+        dirty_rects.append(column)
+
+    draw_info.touched.clear()
+    draw_info.highlighted = set(color_positions)
+    if dirty_rects:
+        update_display(draw_info, dirty_rects)
+
+
+# Draws every bar in one NumPy pass: the bar tops and colors are computed for all pixel columns
+# at once, turned into an RGB pixel block and copied onto the window with surfarray.
+# Lists with more bars than pixel columns are drawn by draw_columns_vectorized instead.
+def draw_list_vectorized(draw_info, color_positions={}):
+    values = as_numpy(draw_info.lst)
+    n = len(values)
+    plot = draw_info.plot_rect()
+
+    columns = n * draw_info.block_width
+    column_bars = numpy.arange(columns) // draw_info.block_width
+
+    size = (columns, plot.height)
+    if draw_info.plot_surface is None or draw_info.plot_surface.get_size() != size:
+        draw_info.plot_surface = pygame.Surface(size, depth=32)
+    surface = draw_info.plot_surface
+
+    # Colors are packed into the surface's 32-bit pixel format so the pixel block is a 2D int array.
+    if draw_info.bar_colors is None:
+        gradients = numpy.array([surface.map_rgb(color) for color in draw_info.GRADIENTS], dtype=numpy.uint32)
+        draw_info.bar_colors = gradients[numpy.arange(n) % 3]
+        for first, last, color in draw_info.ranges:
+            draw_info.bar_colors[first:last + 1] = surface.map_rgb(color)
+    colors = draw_info.bar_colors[column_bars]
+    if color_positions:
+        highlighted = numpy.fromiter(color_positions, dtype=numpy.int64, count=len(color_positions))
+        order = numpy.argsort(highlighted)
+        highlighted = highlighted[order]
+        highlight_colors = numpy.array([surface.map_rgb(color) for color in color_positions.values()],
+                                       dtype=numpy.uint32)[order]
+        found = numpy.searchsorted(highlighted, column_bars).clip(0, len(highlighted) - 1)
+        hit = highlighted[found] == column_bars
+        colors[hit] = highlight_colors[found[hit]]
+
+    tops = draw_info.height - (values[column_bars] - draw_info.min_val) * draw_info.block_height
+    rows = numpy.arange(draw_info.TOP_PAD, draw_info.height)
+    filled = rows[numpy.newaxis, :] >= tops[:, numpy.newaxis]
+    pixels = pygame.surfarray.pixels2d(surface)
+    background = numpy.uint32(surface.map_rgb(draw_info.BACKGROUND_COLOR))
+    pixels[...] = numpy.where(filled, colors[:, numpy.newaxis], background)
+    del pixels  # unlocks the surface before blitting
+    pygame.draw.rect(draw_info.window, draw_info.BACKGROUND_COLOR, plot)
+    draw_info.window.blit(draw_info.plot_surface, (draw_info.start_x, plot.y))
+    draw_info.touched.clear()
+
+
+# What column c of a summarized list looks like: the pixel rows of its largest, smallest and mean value
+# and its color. Columns are compared by shape, so one is only repainted when a pixel of it would change.
+def column_shape(draw_info, c, color=None):
+    summary = draw_info.columns
+    if color is None:
+        color = column_color(draw_info, c)
+    return (int(draw_info.height - (summary.high[c] - draw_info.min_val) * draw_info.block_height),
+            int(draw_info.height - (summary.low[c] - draw_info.min_val) * draw_info.block_height),
+            int(draw_info.height - (summary.mean(c) - draw_info.min_val) * draw_info.block_height),
+            color)
+
+
+# A column is solid in its color up to its smallest value, a light band from there to its largest, and
+# marked with a dark pixel at its mean. A sorted stretch has a narrow band and looks like ordinary bars.
+def paint_column(draw_info, x, shape):
+    high, low, mean, color = shape
+    window = draw_info.window
+    window.fill(draw_info.GRADIENTS[2], (x, high, 1, low - high + 1))
+    window.fill(color, (x, low, 1, draw_info.height - low))
+    window.fill(draw_info.BLACK, (x, mean, 1, 1))
+
+
+# Base color of column c: the tint of the worker that owns its first index, else the darkest gradient.
+def column_color(draw_info, c):
+    first = draw_info.columns.starts[c]
+    for start, last, color in draw_info.ranges:
+        if start <= first <= last:
+            return color
+    return draw_info.GRADIENTS[0]
+
+
+# Highlights by column: a column takes the color of a highlighted value under it.
+def column_colors(draw_info, color_positions):
+    column = draw_info.columns.column
+    return {column(i): color for i, color in color_positions.items()}
+
+
+# Draws a list with more values than pixel columns as one summarized column per pixel (see ColumnSummary),
+# so the cost of a frame is bounded by the plot's width. The summary is brought up to date from the indices
+# touched since the last frame, or from the whole list after draw_info.drawn was reset.
+def draw_columns(draw_info, color_positions={}, clear_bg=False):
+    summary = draw_info.columns
+    if draw_info.drawn is None:
+        summary.refresh()
+    else:
+        summary.update(draw_info.touched)
+    highlight = column_colors(draw_info, color_positions)
+
+    plot = draw_info.plot_rect()
+    pygame.draw.rect(draw_info.window, draw_info.BACKGROUND_COLOR, plot)
+    if draw_info.vectorized:
+        drawn = draw_columns_vectorized(draw_info, highlight)
+    else:
+        drawn = []
+        for c in range(summary.columns):
+            shape = column_shape(draw_info, c, highlight.get(c))
+            paint_column(draw_info, draw_info.start_x + c, shape)
+            drawn.append(shape)
+
+    draw_info.drawn = drawn
+    draw_info.touched.clear()
+    draw_info.highlighted = set(highlight)
+    if clear_bg:
+        update_display(draw_info, [plot])
+
+
+# paint_column for every column at once with NumPy, the way draw_list_vectorized draws bars: the rows of each
+# column's extremes and mean are computed as arrays and turned into one pixel block. Returns every column's
+# column_shape(), so the incremental renderer can carry on from it.
+def draw_columns_vectorized(draw_info, highlight):
+    summary = draw_info.columns
+    plot = draw_info.plot_rect()
+    size = (summary.columns, plot.height)
+    if draw_info.plot_surface is None or draw_info.plot_surface.get_size() != size:
+        draw_info.plot_surface = pygame.Surface(size, depth=32)
+    surface = draw_info.plot_surface
+
+    def rows(values):
+        return (draw_info.height - (values - draw_info.min_val) * draw_info.block_height).astype(numpy.int64)
+
+    high = rows(numpy.array(summary.high, dtype=numpy.int64))
+    low = rows(numpy.array(summary.low, dtype=numpy.int64))
+    mean = rows(numpy.array(summary.sums, dtype=numpy.int64) / numpy.diff(summary.starts))
+
+    # Each column's color as an index into palette: the darkest gradient, a worker's tint or a highlight.
+    palette = [draw_info.GRADIENTS[0]]
+    color_ids = numpy.zeros(summary.columns, dtype=numpy.int64)
+    firsts = numpy.array(summary.starts[:-1])
+    for first, last, color in reversed(draw_info.ranges):
+        color_ids[(firsts >= first) & (firsts <= last)] = len(palette)
+        palette.append(color)
+    for c, color in highlight.items():
+        color_ids[c] = len(palette)
+        palette.append(color)
+    colors = numpy.array([surface.map_rgb(color) for color in palette], dtype=numpy.uint32)[color_ids]
+
+    y = numpy.arange(draw_info.TOP_PAD, draw_info.height)[numpy.newaxis, :]
+    pixels = pygame.surfarray.pixels2d(surface)
+    pixels[...] = numpy.where(y >= high[:, numpy.newaxis], surface.map_rgb(draw_info.GRADIENTS[2]),
+                              surface.map_rgb(draw_info.BACKGROUND_COLOR))
+    pixels[...] = numpy.where(y >= low[:, numpy.newaxis], colors[:, numpy.newaxis], pixels)
+    pixels[y[0] == mean[:, numpy.newaxis]] = surface.map_rgb(draw_info.BLACK)
+    del pixels  # unlocks the surface before blitting
+    draw_info.window.blit(surface, (draw_info.start_x, plot.y))
+    return list(zip(high.tolist(), low.tolist(), mean.tolist(), [palette[k] for k in color_ids.tolist()]))
+
+
+# draw_list_incremental for summarized lists: only columns whose values changed or that are highlighted
+# in either frame are looked at, and only those whose shape changed are repainted.
+def draw_columns_incremental(draw_info, color_positions={}):
+    if len(draw_info.touched) > draw_info.columns.columns:
+        draw_columns(draw_info, color_positions, True)  # most columns have changed, and one update is cheaper
+        return
+    changed = draw_info.columns.update(draw_info.touched)
+    highlight = column_colors(draw_info, color_positions)
+    drawn = draw_info.drawn
+    dirty_rects = []
+    for c in changed | draw_info.highlighted | highlight.keys():
+        shape = column_shape(draw_info, c, highlight.get(c))
+        if drawn[c] == shape:
+            continue
+        drawn[c] = shape
+
+        column = draw_info.bar_column(c)
+        pygame.draw.rect(draw_info.window, draw_info.BACKGROUND_COLOR, column)
+        paint_column(draw_info, column.x, shape)
+        dirty_rects.append(column)
+
+    draw_info.touched.clear()
+    draw_info.highlighted = set(highlight)
+    if dirty_rects:
+        update_display(draw_info, dirty_rects)
+
+
+# Highlight colors for each kind of step, used by the renderer only.
+def step_colors(draw_info, step):
+    kind, a, b = step
+    if kind == STEP_COMPARE:
+        return {a: draw_info.COMPARE_COLOR, b: draw_info.COMPARE_COLOR}
+    if kind == STEP_SWAP:
+        return {a: draw_info.SEA_GREEN, b: draw_info.PINK_PASTEL}
+    if kind == STEP_WRITE:
+        return {a: draw_info.SEA_GREEN}
+    if kind == STEP_PIVOT:
+        return {a: draw_info.SO_COLOR}
+    if kind == STEP_RANGE:
+        return {}  # shown by the range's tint, see mark_range
+    return {i: draw_info.SEA_GREEN for i in range(a, b + 1)}
+
+
+# Base color of bar i: its worker's tint while a parallel sort owns it, else the usual gradient.
+def bar_color(draw_info, i):
+    for first, last, color in draw_info.ranges:
+        if first <= i <= last:
+            return color
+    return draw_info.GRADIENTS[i % 3]
+
+
+# A RANGE step tints a..b in the next worker color, replacing whatever ranges it overlaps;
+# a DONE step over a range clears the tint there.
+def mark_range(draw_info, a, b, owned):
+    kept = []
+    for first, last, color in draw_info.ranges:
+        if last < a or first > b:
+            kept.append((first, last, color))
+        else:
+            draw_info.touched.update(range(first, last + 1))
+    if owned:
+        kept.append((a, b, draw_info.WORKER_COLORS[draw_info.range_count % len(draw_info.WORKER_COLORS)]))
+        draw_info.range_count += 1
+        draw_info.touched.update(range(a, b + 1))
+    draw_info.ranges = kept
+    draw_info.bar_colors = None
+
+
+# Records which bars a step may have moved so the incremental renderer repaints them.
+def mark_step(draw_info, step):
+    kind, a, b = step
+    if kind == STEP_SWAP:
+        draw_info.touched.add(a)
+        draw_info.touched.add(b)
+    elif kind == STEP_WRITE:
+        draw_info.touched.add(a)
+    elif kind == STEP_RANGE or kind == STEP_DONE and draw_info.ranges:
+        mark_range(draw_info, a, b, kind == STEP_RANGE)
+
+
+def to_backing(lst, backing):
+    if backing == "array":
+        return lst if isinstance(lst, array) and lst.typecode == 'q' else array('q', lst)
+    if backing == "numpy":
+        return numpy.asarray(lst, dtype=numpy.int64)
+    return lst if isinstance(lst, list) else list(lst)
+
+
+# Zero-copy view of an array('q') buffer; lists and NumPy arrays are converted/passed through.
+def as_numpy(lst):
+    if isinstance(lst, array):
+        return numpy.frombuffer(lst, dtype=numpy.int64)
+    return numpy.asarray(lst)
+
+
+# n values between min_val and max_val in one of the datasets.SHAPES, drawn from rng (a fresh one by default).
+def generate_starting_list(n, min_val, max_val, shape="random", rng=None):
+    return generate(shape, n, make_rng() if rng is None else rng, min_val, max_val)
+
+
+result_cache = ResultCache()
+
+
+# Starts a run of `algorithm` on draw_info.lst and returns (stats, generator, recording, cache_key). A run that is
+# already cached replays its stored steps, or with `instant` loads the stored result straight away; cache_key
+# is None then, otherwise the caller stores the run under it once it finishes.
+def start_run(draw_info, algorithm, ascending, instant=False):
+    initial = array('q', draw_info.lst)
+    key = result_key(initial, algorithm.name, ascending)
+    stats = Instrumentation(track_depth=True)
+    entry = result_cache.get(key)
+    # A run too long to record was cached without its steps, so only an instant rerun can use it.
+    if entry is None or entry.trace is None and not instant:
+        return stats, stats.wrap(start_sort(algorithm, draw_info.lst, ascending)), \
+            (initial, StepTrace(), algorithm.name, ascending), key
+
+    stats.max_depth = entry.max_depth
+    if instant:
+        load_values(draw_info.lst, entry.final)
+        draw_info.drawn = None
+        stats.counts[:] = entry.counts
+        generator = iter(())
+    else:
+        generator = stats.wrap(replay_steps(draw_info.lst, entry.trace))
+    return stats, generator, (initial, entry.trace, algorithm.name, ascending), None
+
+
+# Swaps/writes shown per frame for each speed setting; None is "instant", which runs the sort for the whole
+# frame budget every frame, so it finishes as fast as it can while the window keeps handling events.
+SPEEDS = [1, 2, 5, 10, 25, 50, 100, 250, 1000, 5000, None]
+# Seconds of algorithm work allowed per frame, so large speeds can't stall the 60 FPS loop.
+FRAME_BUDGET = 0.012
+
+
+# Where the E key saves the counters of the last run.
+STATS_FILE = "sort_stats.json"
+
+
+def speed_label(steps_per_frame):
+    if steps_per_frame is None:
+        return "Speed: instant"
+    return f"Speed: {steps_per_frame} step{'s' if steps_per_frame > 1 else ''}/frame (Left/Right, F - instant)"
+
+
+def hud_line(stats, steps_per_frame, search=None):
+    if search is not None:
+        return f"{search.hud_text()}  |  {speed_label(steps_per_frame)}"
+    if stats is None:
+        return speed_label(steps_per_frame)
+    return f"{stats.hud_text()}  |  {result_cache.hud_text()}  |  {speed_label(steps_per_frame)}"
+
+
+# Advances the generator by up to steps_per_frame swaps/writes (or whichever step kinds are paced),
+# or until the frame budget runs out; with steps_per_frame None (instant) only the budget applies. Every step is marked on draw_info so one incremental redraw
+# afterwards shows the frame's final state, and appended to trace when one is given. Appending stops
+# once the trace holds more than trace_limit bytes, so the caller can see it is over and drop it.
+# Returns the last step taken (for highlighting) and whether the sort has finished.
+def advance_sort(draw_info, generator, steps_per_frame, budget=FRAME_BUDGET, trace=None, trace_limit=None,
+                 paced=(STEP_SWAP, STEP_WRITE)):
+    deadline = time.perf_counter() + budget
+    moved = 0
+    taken = 0
+    last_step = None
+    for taken, step in enumerate(generator, 1):
+        mark_step(draw_info, step)
+        if trace is not None:
+            trace.append(step)
+            # Checked every 65536 steps, which is often enough: one step adds only 24 bytes.
+            if trace_limit is not None and not taken & 0xFFFF and trace.nbytes() > trace_limit:
+                trace = None
+        last_step = step
+        if steps_per_frame is None:
+            # Instant runs look at the clock every 256 steps rather than on every paced one.
+            if not taken & 0xFF and time.perf_counter() >= deadline:
+                draw_info.step_count += taken
+                return last_step, False
+        elif step[0] in paced:
+            moved += 1
+            if moved >= steps_per_frame or time.perf_counter() >= deadline:
+                draw_info.step_count += taken
+                return last_step, False
+    draw_info.step_count += taken
+    return last_step, True
+
+
+class FrameTimer:
+    """Where the main loop's frames go: algorithm steps, drawing, the display flip and event handling.
+
+    The loop calls begin() at the top of every frame and lap(phase) after each part of it, which adds the
+    time since the previous lap to that phase. Display updates are reported with flipped() as they happen
+    and count as flip time, whichever part of the frame made them. begin() closes the frame before it, whose
+    length runs from one begin() to the next and so also covers the wait for the 60 FPS cap. The last WINDOW
+    frames are kept for the overlay; with a log path every frame is also written to it as a CSV row.
+    """
+
+    PHASES = ("algorithm", "render", "flip", "events")
+    WINDOW = 120
+
+    def __init__(self, log_path=None):
+        # (frame seconds, steps, seconds per phase) of the most recent frames.
+        self.samples = deque(maxlen=self.WINDOW)
+        self.phases = dict.fromkeys(self.PHASES, 0.0)
+        self.frames = 0
+        self.started = time.perf_counter()
+        self.frame_start = None
+        self.last_lap = None
+        self.step_count = 0
+        # Display updates since the last lap: seconds spent, and how many this frame.
+        self.flip_seconds = 0.0
+        self.flips = 0
+        self.log = None
+        if log_path:
+            self.log = open(log_path, "w", newline="")
+            self.writer = csv.writer(self.log)
+            self.writer.writerow(["frame", "seconds", "frame_ms", "steps", *(f"{phase}_ms" for phase in self.PHASES)])
+
+    # step_count is the running total of steps taken (DrawInformation.step_count).
+    def begin(self, step_count):
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            sample = (now - self.frame_start, step_count - self.step_count, *self.phases.values())
+            self.samples.append(sample)
+            self.frames += 1
+            if self.log is not None:
+                self.writer.writerow([self.frames, f"{self.frame_start - self.started:.6f}", f"{sample[0] * 1e3:.3f}",
+                                      sample[1], *(f"{seconds * 1e3:.3f}" for seconds in sample[2:])])
+        self.frame_start = self.last_lap = now
+        self.step_count = step_count
+        self.flips = 0
+        for phase in self.PHASES:
+            self.phases[phase] = 0.0
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] += now - self.last_lap - self.flip_seconds
+        self.phases["flip"] += self.flip_seconds
+        self.flip_seconds = 0.0
+        self.last_lap = now
+
+    def flipped(self, seconds):
+        self.flip_seconds += seconds
+        self.flips += 1
+
+    def fps(self):
+        seconds = sum(sample[0] for sample in self.samples)
+        return len(self.samples) / seconds if seconds else 0.0
+
+    def steps_per_second(self):
+        seconds = sum(sample[0] for sample in self.samples)
+        return sum(sample[1] for sample in self.samples) / seconds if seconds else 0.0
+
+    # Mean milliseconds per frame of every phase over the window.
+    def phase_ms(self):
+        count = max(len(self.samples), 1)
+        return {phase: sum(sample[2 + k] for sample in self.samples) * 1e3 / count
+                for k, phase in enumerate(self.PHASES)}
+
+    # How many of the recent frames took [k * width, (k + 1) * width) milliseconds; the last bucket takes the rest.
+    def histogram(self, buckets=16, width=2.0):
+        counts = [0] * buckets
+        for sample in self.samples:
+            counts[min(int(sample[0] * 1e3 / width), buckets - 1)] += 1
+        return counts
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+# Frames between rebuilds of the overlay panel, so its numbers stay readable and cost little to draw.
+OVERLAY_REFRESH = 15
+# Frame time the overlay's histogram marks as on time: one frame at the 60 FPS cap.
+FRAME_TARGET_MS = 1000 / 60
+
+
+# The F3 overlay in the top right corner of the plot: frame rate, step rate and the mean time per frame of each
+# phase over the last FrameTimer.WINDOW frames, above a histogram of their lengths in 2 ms buckets. It is drawn
+# by update_display over whatever bars are under it, and the panel is only rebuilt every OVERLAY_REFRESH frames.
+# Returns the rect it covers.
+def draw_perf_overlay(draw_info, perf):
+    if draw_info.perf_panel is None or perf.frames - draw_info.perf_panel_frame >= OVERLAY_REFRESH:
+        ms = perf.phase_ms()
+        lines = [f"{perf.fps():.1f} FPS  |  {perf.steps_per_second():,.0f} steps/s",
+                 f"algorithm {ms['algorithm']:.2f}  render {ms['render']:.2f} ms",
+                 f"flip {ms['flip']:.2f}  events {ms['events']:.2f} ms"]
+        panel = pygame.Surface((230, 110), 0, draw_info.window)
+        panel.fill(draw_info.BLACK)
+        for k, line in enumerate(lines):
+            panel.blit(draw_info.FONT.render(line, True, draw_info.WHITE), (6, 2 + k * 20))
+        counts = perf.histogram()
+        tallest = max(max(counts), 1)
+        for k, count in enumerate(counts):
+            height = count * 40 // tallest
+            color = draw_info.SEA_GREEN if k * 2 < FRAME_TARGET_MS else draw_info.PINK_PASTEL
+            panel.fill(color, (6 + k * 14, 104 - height, 12, height))
+        draw_info.perf_panel = panel
+        draw_info.perf_panel_frame = perf.frames
+    plot = draw_info.plot_rect()
+    return draw_info.window.blit(draw_info.perf_panel, (plot.right - draw_info.perf_panel.get_width(), plot.y + 5))
+
+
+# Starts the named search on the list if it is sorted either way, building the index it is timed against
+# only when the list has changed since the last search. Returns None when the list isn't sorted.
+def start_search(draw_info, name):
+    ascending = sorted_direction(draw_info.lst)
+    if ascending is None:
+        print("Sort the list before searching it")
+        return None
+    if draw_info.search_index is None or draw_info.search_index.ascending != ascending:
+        draw_info.search_index = SortedIndex(draw_info.lst, ascending)
+    return SearchRun(name, draw_info.lst, ascending, draw_info.search_index)
+
+
+class SearchRun:
+    """One animated lookup of a random target, plus the throughput of every query mode on the same list.
+
+    The rates compare the step generator run per query, the cached SortedIndex per query and the
+    index answering the whole batch at once, and are shown in the HUD next to the search. They are
+    measured a slice at a time by measure(), which the main loop calls once a frame.
+    """
+
+    QUERIES = 1000
+    # Seconds of measuring per frame, and frames spent on each query mode.
+    RATE_BUDGET = 0.01
+    RATE_FRAMES = 5
+
+    def __init__(self, name, lst, ascending, index):
+        self.name = name
+        self.found = None
+        rng = random.Random()
+        low, high = min(lst), max(lst)
+        queries = [int(rng.choice(lst)) if rng.random() < 0.5 else rng.randint(low, high)
+                   for _ in range(self.QUERIES)]
+        self.target = queries[0]
+        self.queries = queries
+
+        search = SEARCHES[name]
+
+        def run_steps(target):
+            for _ in search(lst, target, ascending):
+                pass
+
+        # (mode, answer, batched) still to measure, the rates measured in the frames so far, and the finished rates.
+        self.pending = [("steps", run_steps, False), ("index", index.find, False), ("batched", index.find_many, True)]
+        self.samples = []
+        self.rates = {}
+        self.stats = Instrumentation()
+        self.generator = self.stats.wrap(search(lst, self.target, ascending))
+
+    # Measures the next query mode for RATE_BUDGET seconds, so the window never stalls for the whole measurement.
+    def measure(self):
+        if not self.pending:
+            return
+        mode, answer, batched = self.pending[0]
+        self.samples.append(queries_per_second(answer, self.queries, batched, self.RATE_BUDGET))
+        if len(self.samples) == self.RATE_FRAMES:
+            self.rates[mode] = sum(self.samples) / len(self.samples)
+            self.samples = []
+            self.pending.pop(0)
+
+    def highlight(self, draw_info):
+        return {} if self.found is None else {self.found: draw_info.SEA_GREEN}
+
+    def hud_text(self):
+        probes = self.stats.counts[STEP_COMPARE]
+        if self.generator is not None:
+            result = "searching"
+        elif self.found is None:
+            result = "not found"
+        else:
+            result = f"index {self.found}"
+        rates = ", ".join(f"{mode} {rate_label(rate)}" for mode, rate in self.rates.items())
+        if self.pending:
+            rates = f"{rates}, measuring {self.pending[0][0]}" if rates else f"measuring {self.pending[0][0]}"
+        return f"{self.name} {self.target}: {result}, {probes} probes | queries/s: {rates}"
+
+
+# Trace files: a fixed header, the starting list, the step stream (3 int64 per step) and keyframes,
+# the full list after every `interval` steps, starting with keyframe 0 after step 0. Everything
+# after the header is little-endian int64, so a loaded file is just typed views over one mmap.
+TRACE_MAGIC = b"SORTTRC1"
+TRACE_VERSION = 1
+TRACE_HEADER = struct.Struct("<8sHHIqqq64s")  # magic, version, ascending, keyframes, n, steps, interval, name
+TRACE_FILE = "last_sort.trace"
+
+
+# Keyframes every `interval` steps cost about as much disk as the steps themselves when
+# interval is at least the list length, and a seek never replays more than interval steps.
+def save_trace(path, initial, trace, name, ascending, interval=None):
+    n = len(initial)
+    if interval is None:
+        interval = max(1024, n)
+    steps = len(trace)
+    keyframes = steps // interval + 1
+
+    with open(path, "wb") as f:
+        f.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, ascending, keyframes, n, steps, interval,
+                                  name.encode()[:64]))
+        state = array('q', initial)
+        state.tofile(f)
+        trace.buffer.tofile(f)
+        for k in range(keyframes):
+            for i in range(max(k - 1, 0) * interval, k * interval):
+                apply_step(state, trace[i])
+            state.tofile(f)
+
+
+class TraceFile:
+    """A memory-mapped trace file. `initial`, `steps` and keyframes are int64 views into the map."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, ascending, keyframes, n, steps, interval, name = TRACE_HEADER.unpack_from(self.map)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{path} is not a version {TRACE_VERSION} sort trace")
+
+        self.ascending = bool(ascending)
+        self.name = name.rstrip(b"\0").decode()
+        self.n = n
+        self.interval = interval
+        self.keyframe_count = keyframes
+
+        values = memoryview(self.map)[TRACE_HEADER.size:].cast('q')
+        self.initial = values[:n]
+        self.steps = values[n: n + 3 * steps]
+        self.keyframes = values[n + 3 * steps:]
+
+    def __len__(self):
+        return len(self.steps) // 3
+
+    def step(self, index):
+        k = 3 * index
+        return self.steps[k], self.steps[k + 1], self.steps[k + 2]
+
+    def keyframe(self, k):
+        return self.keyframes[k * self.n: (k + 1) * self.n]
+
+
+class TracePlayer:
+    """Plays a TraceFile into lst. `position` is the number of steps applied so far."""
+
+    def __init__(self, trace_file, lst):
+        self.trace = trace_file
+        self.lst = lst
+        self.position = 0
+        load_values(lst, trace_file.initial)
+
+    # Jumps to any step by restoring the nearest keyframe at or before it and replaying the rest.
+    # Short forward moves just keep stepping from where the player already is.
+    def seek(self, position):
+        position = max(0, min(position, len(self.trace)))
+        interval = self.trace.interval
+        if position < self.position or position - self.position > interval:
+            k = position // interval
+            load_values(self.lst, self.trace.keyframe(k))
+            self.position = k * interval
+        last_step = None
+        while self.position < position:
+            last_step = self.trace.step(self.position)
+            apply_step(self.lst, last_step)
+            self.position += 1
+        return last_step
 
 
-def insertion_sort(draw_info, ascending=True):
-    lst = draw_info.lst
-    for i in range(1, len(lst)):
-        current = lst[i]
-        while True:
-            ascending_sort = i > 0 and lst[i - 1] > current and ascending
-            descending_sort = i > 0 and lst[i - 1] < current and not ascending
+# function which creates a selection tool window.
+# It is the same every frame while it waits for input, so it is drawn onto a surface once.
+selection_screen = None
 
-            if not ascending_sort and not descending_sort:
-                break
 
-            lst[i] = lst[i - 1]
-            i = i - 1
-            lst[i] = current
-            draw_list(draw_info, {i - 1: draw_info.SEA_GREEN, i: draw_info.PINK_PASTEL}, True)
-            yield True
-    return lst
+def draw_initial_selection_screen(window, width, height, buttons):
+    global selection_screen
+    if selection_screen is None or selection_screen.get_size() != (width, height):
+        selection_screen = pygame.Surface((width, height), 0, window)
+        selection_screen.fill(DrawInformation.BACKGROUND_COLOR)
 
+        title = render_text(DrawInformation.TITLE_FONT, "Select Input Method", DrawInformation.T_COLOR)
+        selection_screen.blit(title, (width // 2 - title.get_width() // 2, height // 4 - title.get_height() // 2))
 
-def selection_sort(draw_info, ascending=True):
-    lst = draw_info.lst
-    n = len(lst)
-    for i in range(n):
-        swap_inx = i
-        for j in range(i + 1, n):
-            if (ascending and lst[j] < lst[swap_inx]) or (not ascending and lst[j] > lst[swap_inx]):
-                swap_inx = j
+        for button in buttons:
+            pygame.draw.rect(selection_screen, DrawInformation.LF_COLOR, button['rect'])
+            text_surf = render_text(DrawInformation.BUTTON_FONT, button['text'], DrawInformation.BLACK)
+            text_rect = text_surf.get_rect(center=button['rect'].center)
+            selection_screen.blit(text_surf, text_rect)
 
-        # Swap the elements
-        lst[i], lst[swap_inx] = lst[swap_inx], lst[i]
+    window.blit(selection_screen, (0, 0))
+    pygame.display.update()
 
-        # Update the display to show the current sorting state
-        draw_list(draw_info, {i: draw_info.SEA_GREEN, swap_inx: draw_info.PINK_PASTEL}, True)
-        yield True
-    return lst
+# Decoded sounds by algorithm name, filled in by load_sounds().
+sounds = {}
 
 
-# Implementing Merge sort by 2 functions - merge&merge sort
-def merge(draw_info, left, mid, right, ascending=True):
-    lst = draw_info.lst
-    left_copy = lst[left: mid + 1]
-    right_copy = lst[mid + 1: right + 1]
-    left_copy_index = 0
-    right_copy_index = 0
-    sorted_index = left
-
-    while left_copy_index < len(left_copy) and right_copy_index < len(right_copy):
-        if (left_copy[left_copy_index] < right_copy[right_copy_index] and ascending) or (
-                left_copy[left_copy_index] >= right_copy[right_copy_index] and not ascending):
-            lst[sorted_index] = left_copy[left_copy_index]
-            left_copy_index += 1
-        else:
-            lst[sorted_index] = right_copy[right_copy_index]
-            right_copy_index += 1
+# Opens the audio device and decodes every sound file on a background thread, so neither the first frame
+# nor starting a sort waits for them. A sort started before its sound is ready just plays silently.
+def preload_sounds():
+    thread = threading.Thread(target=load_sounds, daemon=True)
+    thread.start()
+    return thread
 
-        draw_list(draw_info, {sorted_index: draw_info.SEA_GREEN}, True)
-        sorted_index += 1
-        yield True
 
-    while left_copy_index < len(left_copy):
-        lst[sorted_index] = left_copy[left_copy_index]
-        left_copy_index += 1
-        sorted_index += 1
-        draw_list(draw_info, {sorted_index: draw_info.PINK_PASTEL}, True)
-        yield True
+def load_sounds():
+    try:
+        pygame.mixer.init()
+    except pygame.error as e:
+        print(f"Sound is off: {e}")
+        return
+    for algorithm in ALGORITHMS.values():
+        if algorithm.sound is None:
+            continue
+        try:
+            sounds[algorithm.name] = pygame.mixer.Sound(algorithm.sound)
+        except (pygame.error, FileNotFoundError) as e:
+            print(f"Error loading sound file '{algorithm.sound}': {e}")
+
 
-    while right_copy_index < len(right_copy):
-        lst[sorted_index] = right_copy[right_copy_index]
-        right_copy_index += 1
-        sorted_index += 1
-        draw_list(draw_info, {sorted_index: draw_info.SEA_GREEN}, True)
-        yield True
+# Adding sounds for each sort
+def play_sorting_sound(algo_name):
+    sound = sounds.get(algo_name)
+    if sound is None:
+        return False
+    sound.play(-1)
+    return True
 
 
-def merge_sort(draw_info, left, right, ascending=True):
-    lst = draw_info.lst
-    if left >= right:
-        return
-    mid = (left + right) // 2
-    yield from merge_sort(draw_info, left, mid, ascending)
-    yield from merge_sort(draw_info, mid + 1, right, ascending)
-    yield from merge(draw_info, left, mid, right, ascending)
+def stop_sorting_sound():
+    if pygame.mixer.get_init():
+        pygame.mixer.stop()
 
 
-def quick_sort(draw_info, ascending=True):
-    lst = draw_info.lst
+def draw_replay(draw_info, player, timeline, hud_text, last_step):
+    draw_info.window.fill(draw_info.BACKGROUND_COLOR)
 
-    def partition(low, high):
-        pivot = lst[high]
-        i = low - 1
-        for j in range(low, high):
-            if (lst[j] < pivot and ascending) or (lst[j] > pivot and not ascending):
-                i += 1
-                lst[i], lst[j] = lst[j], lst[i]
-                draw_list(draw_info, {i: draw_info.SEA_GREEN, j: draw_info.PINK_PASTEL}, True)
-                yield True
-        lst[i + 1], lst[high] = lst[high], lst[i + 1]
-        draw_list(draw_info, {i + 1: draw_info.SEA_GREEN, high: draw_info.PINK_PASTEL}, True)
-        yield True
-        return i + 1
-
-    def quick_sort_recursive(low, high):
-        if low < high:
-            pi = yield from partition(low, high)
-            yield from quick_sort_recursive(low, pi - 1)
-            yield from quick_sort_recursive(pi + 1, high)
-
-    yield from quick_sort_recursive(0, len(lst) - 1)
-    return lst
-
-
-def cocktail_shaker_sort(draw_info, ascending=True):
-    lst = draw_info.lst
-    n = len(lst)
-    swapped = True
-    start = 0
-    end = n - 1
-
-    while swapped:
-        swapped = False
-        for i in range(start, end):
-            if (ascending and lst[i] > lst[i + 1]) or (not ascending and lst[i] < lst[i + 1]):
-                lst[i], lst[i + 1] = lst[i + 1], lst[i]
-                swapped = True
-                draw_list(draw_info, {i: draw_info.SEA_GREEN, i + 1: draw_info.PINK_PASTEL}, True)
-                yield True
-
-        if not swapped:
+    title = render_text(draw_info.TITLE_FONT,
+                        f"Replay: {player.trace.name} - {'Ascending' if player.trace.ascending else 'Descending'}",
+                        draw_info.T_COLOR)
+    draw_info.window.blit(title, (draw_info.width / 2 - title.get_width() / 2, 5))
+
+    controls = render_text(draw_info.FONT, "SPACE - Play/Pause | , . - Step | Backspace - Reverse | Home/End | "
+                           "Click the timeline to seek", draw_info.SO_COLOR)
+    draw_info.window.blit(controls, (draw_info.width / 2 - controls.get_width() / 2, 60))
+
+    pygame.draw.rect(draw_info.window, draw_info.GRADIENTS[2], timeline)
+    if len(player.trace):
+        done = timeline.copy()
+        done.width = timeline.width * player.position // len(player.trace)
+        pygame.draw.rect(draw_info.window, draw_info.LF_COLOR, done)
+
+    draw_info.drawn = None  # seeking changes the list without marking what moved
+    draw_list(draw_info, step_colors(draw_info, last_step) if last_step else {})
+    draw_hud(draw_info, hud_text, update=False)
+    pygame.display.update()
+
+
+# Plays a TraceFile: forwards or backwards at any of the SPEEDS (counted in steps of any kind), one step
+# at a time, or by seeking straight to the clicked/dragged point on the timeline.
+def run_replay(draw_info, player, clock):
+    total = len(player.trace)
+    timeline = pygame.Rect(10, 95, draw_info.width - 20, 14)
+    playing = False
+    scrubbing = False
+    direction = 1
+    speed_index = 0
+    last_step = None
+    run = True
+
+    while run:
+        clock.tick(60)
+
+        if playing:
+            speed = SPEEDS[speed_index]
+            if speed is None:
+                target = total if direction > 0 else 0
+            else:
+                target = player.position + direction * speed
+            last_step = player.seek(target)
+            if player.position == (total if direction > 0 else 0):
+                playing = False
+
+        hud_text = (f"Step {player.position} / {total}  {'>' if direction > 0 else '<'}  |  "
+                    f"{speed_label(SPEEDS[speed_index])}")
+        draw_replay(draw_info, player, timeline, hud_text, last_step)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                run = False
+
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    if not playing and player.position == (total if direction > 0 else 0):
+                        player.seek(0 if direction > 0 else total)
+                    playing = not playing
+                elif event.key == pygame.K_RIGHT:
+                    speed_index = min(speed_index + 1, len(SPEEDS) - 1)
+                elif event.key == pygame.K_LEFT:
+                    speed_index = max(speed_index - 1, 0)
+                elif event.key == pygame.K_f:
+                    speed_index = len(SPEEDS) - 1
+                elif event.key == pygame.K_BACKSPACE:
+                    direction = -direction
+                elif event.key == pygame.K_PERIOD:
+                    playing = False
+                    last_step = player.seek(player.position + 1)
+                elif event.key == pygame.K_COMMA:
+                    playing = False
+                    last_step = player.seek(player.position - 1)
+                elif event.key == pygame.K_HOME:
+                    last_step = player.seek(0)
+                elif event.key == pygame.K_END:
+                    last_step = player.seek(total)
+
+            elif event.type == pygame.MOUSEBUTTONDOWN and timeline.collidepoint(event.pos):
+                scrubbing = True
+                playing = False
+            elif event.type == pygame.MOUSEBUTTONUP:
+                scrubbing = False
+
+            if scrubbing and event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION):
+                fraction = min(max((event.pos[0] - timeline.x) / timeline.width, 0), 1)
+                last_step = player.seek(round(fraction * total))
+
+
+# Bars in the view of an external sort, each showing the value at one evenly spaced position of the file.
+EXTERNAL_BARS = 140
+
+
+# Window for --external: SPACE starts or pauses the sort and the speed keys work as on the main screen,
+# where heartbeats count as steps too. Closing the window stops the sort and removes its temporary files.
+def run_external(draw_info, external, name, clock):
+    title = f"External {name}"
+    stats = Instrumentation(track_depth=True)
+    steps = external.steps(draw_info.lst)
+    generator = stats.wrap(steps)
+    running = False
+    speed_index = 0
+    run = True
+
+    while run:
+        clock.tick(60)
+
+        hud_text = f"{external.hud_text(stats.seconds)}  |  {speed_label(SPEEDS[speed_index])}"
+        if running:
+            last_step, finished = advance_sort(draw_info, generator, SPEEDS[speed_index],
+                                               paced=(STEP_WRITE, STEP_COMPARE))
+            if last_step is not None:
+                draw_list_incremental(draw_info, step_colors(draw_info, last_step))
+            if finished:
+                running = False
+                print(f"Wrote {external.n} sorted values to {external.output}")
+            if draw_info.hud_text != hud_text:
+                draw_hud(draw_info, hud_text)
+        else:
+            draw(draw_info, title, external.ascending, [], hud_text=hud_text)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                run = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE and external.phase != "done":
+                    running = not running
+                elif event.key == pygame.K_RIGHT:
+                    speed_index = min(speed_index + 1, len(SPEEDS) - 1)
+                elif event.key == pygame.K_LEFT:
+                    speed_index = max(speed_index - 1, 0)
+                elif event.key == pygame.K_f:
+                    speed_index = len(SPEEDS) - 1
+
+    steps.close()
+
+
+class LaneInformation(DrawInformation):
+    """DrawInformation for one lane of the race screen, with room for a single line of text on top."""
+    SIDE_PAD = 20
+    TOP_PAD = 22
+
+
+# Seconds of algorithm time each lane gets per frame and per speed unit when racing by wall time.
+RACE_TIME_UNIT = 0.00002
+
+
+# Runs in a worker process: sorts its own copy of the shared starting list and, for every command,
+# advances until it has made `amount` comparisons in total ("compares") or spent `amount` more
+# seconds ("seconds"), then copies the list back into shared memory and reports its counters.
+def race_worker(name, ascending, shared, conn):
+    values = memoryview(shared).cast('B').cast('q')
+    lst = values.tolist()
+    stats = Instrumentation()
+    counts = stats.counts
+    generator = stats.wrap(start_sort(ALGORITHMS[name], lst, ascending))
+    spent = 0.0
+    finished = False
+    last_step = None
+
+    while True:
+        command, amount = conn.recv()
+        if command == "stop":
             break
 
-        swapped = False
-        end = end - 1
+        start = time.perf_counter()
+        if not finished:
+            deadline = start + amount if command == "seconds" else None
+            for step in generator:
+                last_step = step
+                if deadline is None:
+                    if counts[STEP_COMPARE] >= amount:
+                        break
+                elif not sum(counts) & 0x3F and time.perf_counter() >= deadline:
+                    break
+            else:
+                finished = True
+        spent += time.perf_counter() - start
 
-        for i in range(end - 1, start - 1, -1):
-            if (ascending and lst[i] > lst[i + 1]) or (not ascending and lst[i] < lst[i + 1]):
-                lst[i], lst[i + 1] = lst[i + 1], lst[i]
-                swapped = True
-                draw_list(draw_info, {i: draw_info.SEA_GREEN, i + 1: draw_info.PINK_PASTEL}, True)
-                yield True
+        values[:] = array('q', lst)
+        conn.send((list(counts), spent, finished, last_step))
+    conn.close()
 
-        start = start + 1
 
+class RaceLane:
+    def __init__(self, name, lst, ascending, window, backing):
+        self.name = name
+        self.shared = multiprocessing.RawArray('q', len(lst))
+        memoryview(self.shared).cast('B').cast('q')[:] = array('q', lst)
+        self.draw_info = LaneInformation(window.get_width(), window.get_height(), list(lst), backing, window)
 
-def heapify(draw_info, n, i, ascending=True):
-    lst = draw_info.lst
-    largest = i
-    l = 2 * i + 1
-    r = 2 * i + 2
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=race_worker, args=(name, ascending, self.shared, child_conn),
+                                               daemon=True)
+        self.process.start()
+        child_conn.close()
 
-    if l < n and ((lst[i] < lst[l] and ascending) or (lst[i] > lst[l] and not ascending)):
-        largest = l
+        self.counts = [0] * len(STEP_NAMES)
+        self.seconds = 0.0
+        self.finished = False
+        self.waiting = False
+        self.last_step = None
 
-    if r < n and ((lst[largest] < lst[r] and ascending) or (lst[largest] > lst[r] and not ascending)):
-        largest = r
+    def send(self, command, amount):
+        self.conn.send((command, amount))
+        self.waiting = True
 
-    if largest != i:
-        lst[i], lst[largest] = lst[largest], lst[i]
-        draw_list(draw_info, {i: draw_info.SEA_GREEN, largest: draw_info.PINK_PASTEL}, True)
-        yield True
-        yield from heapify(draw_info, n, largest, ascending)
+    def receive(self):
+        self.counts, self.seconds, self.finished, self.last_step = self.conn.recv()
+        load_values(self.draw_info.lst, memoryview(self.shared).cast('B').cast('q'))
+        self.draw_info.drawn = None
+        self.waiting = False
 
+    def stop(self):
+        self.conn.send(("stop", 0))
+        self.process.join()
 
-def heap_sort(draw_info, ascending=True):
-    lst = draw_info.lst
-    n = len(lst)
+    def score(self, by):
+        return self.counts[STEP_COMPARE] if by == "compares" else self.seconds
 
-    for i in range(n // 2 - 1, -1, -1):
-        yield from heapify(draw_info, n, i, ascending)
 
-    for i in range(n - 1, 0, -1):
-        lst[i], lst[0] = lst[0], lst[i]
-        draw_list(draw_info, {i: draw_info.SEA_GREEN, 0: draw_info.PINK_PASTEL}, True)
-        yield from heapify(draw_info, i, 0, ascending)
+def race_speed_label(speed, by):
+    if speed is None:
+        return "Speed: instant"
+    if by == "compares":
+        return f"Speed: {speed} compares/frame"
+    return f"Speed: {speed * RACE_TIME_UNIT * 1000:.2f} ms/frame per lane"
 
 
-# function which creates a selection tool window.
-def draw_initial_selection_screen(window, width, height, buttons):
+def draw_race(window, lanes, by, ascending, speed_text, panel):
     window.fill(DrawInformation.BACKGROUND_COLOR)
 
-    title_font = pygame.font.SysFont('Stencil', 36)
-    button_font = pygame.font.SysFont('Lucida Handwriting', 24)
+    title = render_text(DrawInformation.TITLE_FONT, f"Race - {'Ascending' if ascending else 'Descending'}",
+                        DrawInformation.T_COLOR)
+    window.blit(title, (panel.x // 2 - title.get_width() // 2, 2))
+
+    for lane in lanes:
+        info = lane.draw_info
+        moved = lane.counts[STEP_SWAP] + lane.counts[STEP_WRITE]
+        label = (f"{lane.name}  -  compares: {lane.counts[STEP_COMPARE]}  moves: {moved}  "
+                 f"time: {lane.seconds:.3f}s{'  - done' if lane.finished else ''}")
+        text = info.FONT.render(label, 1, info.SO_COLOR if lane.finished else info.BLACK)
+        info.window.blit(text, (info.SIDE_PAD // 2, 2))
+        draw_list(info, step_colors(info, lane.last_step) if lane.last_step and not lane.finished else {})
+
+    # Leaderboard: finished lanes by their final score, then the rest by how far they have got.
+    pygame.draw.rect(window, DrawInformation.GRADIENTS[2], panel)
+    heading = render_text(DrawInformation.LARGE_FONT, f"Leaderboard ({by})", DrawInformation.BLACK)
+    window.blit(heading, (panel.x + 10, panel.y + 10))
+    finished = sorted((lane for lane in lanes if lane.finished), key=lambda lane: lane.score(by))
+    running = [lane for lane in lanes if not lane.finished]
+    for rank, lane in enumerate(finished + running, 1):
+        score = f"{lane.score(by)}" if by == "compares" else f"{lane.score(by):.3f}s"
+        line = DrawInformation.FONT.render(f"{rank}. {lane.name}  {score if lane.finished else '...'}", 1,
+                                           DrawInformation.BLACK)
+        window.blit(line, (panel.x + 10, panel.y + 40 + 22 * rank))
+    hint = render_text(DrawInformation.FONT, "SPACE - Start/Pause | Left/Right - Speed", DrawInformation.BLACK)
+    window.blit(hint, (panel.x + 10, panel.bottom - 50))
+    speed = render_text(DrawInformation.FONT, speed_text, DrawInformation.BLACK)
+    window.blit(speed, (panel.x + 10, panel.bottom - 28))
 
-    title = title_font.render("Select Input Method", True, DrawInformation.T_COLOR)
-    window.blit(title, (width // 2 - title.get_width() // 2, height // 4 - title.get_height() // 2))
+    pygame.display.update()
 
-    for button in buttons:
-        pygame.draw.rect(window, DrawInformation.LF_COLOR, button['rect'])
-        text_surf = button_font.render(button['text'], True, DrawInformation.BLACK)
-        text_rect = text_surf.get_rect(center=button['rect'].center)
-        window.blit(text_surf, text_rect)
 
-    pygame.display.update()
+# Split-screen race: every lane sorts a copy of the same list in its own worker process, so the
+# render loop only collects results and draws. Lanes advance in lockstep: the next comparison
+# target (or time slice) is handed out only once every running lane has reported back.
+def run_race(names, lst, ascending, by, backing, clock, width=800, height=600):
+    window = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("Sorting Algorithm Race")
+    panel = pygame.Rect(width - 200, 0, 200, height)
+    lane_top = 45
+    lane_height = (height - lane_top) // len(names)
+    lanes = [RaceLane(name, lst, ascending,
+                      window.subsurface((0, lane_top + i * lane_height, panel.x, lane_height)), backing)
+             for i, name in enumerate(names)]
+
+    racing = False
+    speed_index = 0
+    target = 0
+    run = True
+    while run:
+        clock.tick(60)
 
-# Adding sounds for each sort
-def play_sorting_sound(algo_name):
-    sound_files = {
-        "Bubble Sort": "Bubble.mp3",
-        "Insertion Sort": "insertion.mp3",
-        "Selection Sort": "selection.mp3",
-        "Quick Sort": "quick.mp3",
-        "Cocktail Shaker Sort": "shaker.mp3",
-        "Heap Sort": "heap.mp3"
-    }
-    if algo_name in sound_files:
-        try:
-            print(f"Loading sound: {sound_files[algo_name]} for {algo_name}")
-            pygame.mixer.music.load(sound_files[algo_name])
-            pygame.mixer.music.play(-1)
-            return True
-        except pygame.error as e:
-            print(f"Error loading sound file '{sound_files[algo_name]}': {e}")
-            return False
-    return False
+        for lane in lanes:
+            if lane.waiting and lane.conn.poll():
+                lane.receive()
+
+        running = [lane for lane in lanes if not lane.finished]
+        if racing and running and not any(lane.waiting for lane in running):
+            speed = SPEEDS[speed_index]
+            if by == "compares":
+                target = float("inf") if speed is None else target + speed
+                for lane in running:
+                    lane.send("compares", target)
+            else:
+                for lane in running:
+                    lane.send("seconds", float("inf") if speed is None else speed * RACE_TIME_UNIT)
 
+        draw_race(window, lanes, by, ascending, race_speed_label(SPEEDS[speed_index], by), panel)
 
-def main():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                run = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    racing = not racing
+                elif event.key == pygame.K_RIGHT:
+                    speed_index = min(speed_index + 1, len(SPEEDS) - 1)
+                elif event.key == pygame.K_LEFT:
+                    speed_index = max(speed_index - 1, 0)
+                elif event.key == pygame.K_f:
+                    speed_index = len(SPEEDS) - 1
+
+    for lane in lanes:
+        if lane.waiting:
+            lane.receive()
+        lane.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sorting algorithm visualizer.")
+    parser.add_argument("--size", type=int, default=50, help="initial number of elements (default: 50)")
+    parser.add_argument("--max-size", type=int, default=100,
+                        help="largest size the + key and button go up to (default: 100, or --size if larger)")
+    parser.add_argument("--size-step", type=int, default=10,
+                        help="elements added or removed by + and -, and the smallest size (default: 10)")
+    parser.add_argument("--shape", choices=list(SHAPES), default="random",
+                        help="distribution of every generated list; organ-pipe and quicksort-killer spread their "
+                             "ranks over --value-range and don't depend on --seed (default: random)")
+    parser.add_argument("--value-range", type=int, nargs=2, default=[0, 100], metavar=("LOW", "HIGH"),
+                        help="bounds of the generated values (default: 0 100)")
+    parser.add_argument("--seed", type=int, help="seed for the generated lists, so a run can be repeated")
+    parser.add_argument("--load", metavar="PATH",
+                        help="start from the values in a .csv/.txt, .npy or raw int64 file instead of a generated list")
+    parser.add_argument("--backing", choices=DrawInformation.BACKINGS, default="list",
+                        help="store the values in a list, an array('q') buffer or a NumPy array; "
+                             "the buffer kinds use the vectorized renderer (default: list)")
+    parser.add_argument("--replay", metavar="PATH", help="open a recorded trace file in the replay player")
+    parser.add_argument("--record", metavar="PATH",
+                        help="run --algorithm on a random list of --size elements without a window and save the "
+                             "trace to PATH")
+    parser.add_argument("--algorithm", choices=list(ALGORITHMS), default="Bubble Sort",
+                        help="algorithm for --record and --external")
+    parser.add_argument("--descending", action="store_true", help="sort descending for --record, --external and --race")
+    parser.add_argument("--external", metavar="PATH",
+                        help="sort a file of int64s (or a .csv/.txt of integers) too big for memory with an external "
+                             "merge sort, using --algorithm for the runs")
+    parser.add_argument("--output", metavar="PATH",
+                        help="where --external writes the sorted values (default: the input name with .sorted)")
+    parser.add_argument("--run-length", type=int, default=RUN_LENGTH,
+                        help=f"values sorted in memory per run for --external (default: {RUN_LENGTH})")
+    parser.add_argument("--race", nargs="+", choices=list(ALGORITHMS), metavar="NAME",
+                        help="race 2-7 algorithms side by side on the same list")
+    parser.add_argument("--perf", action="store_true", help="start with the performance overlay shown (F3 toggles it)")
+    parser.add_argument("--perf-log", metavar="PATH",
+                        help="write every frame's timings to PATH as CSV: length, steps and time per phase")
+    parser.add_argument("--race-by", choices=["compares", "time"], default="compares",
+                        help="advance race lanes by equal comparison counts or equal algorithm time")
+    args = parser.parse_args(argv)
+    if args.size < 1 or args.size_step < 1:
+        parser.error("--size and --size-step must be at least 1")
+    if args.value_range[0] > args.value_range[1]:
+        parser.error("--value-range takes LOW then HIGH")
+    if args.race and not 2 <= len(args.race) <= 7:
+        parser.error("--race takes between 2 and 7 algorithms")
+    if args.backing != "list" and numpy is None:
+        parser.error(f"--backing {args.backing} needs NumPy installed")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
     run = True
     clock = pygame.time.Clock()
 
-    n = 50  # Initial size of the array
-    min_val = 0
-    max_val = 100
-    lst = generate_starting_list(n, min_val, max_val)
-    draw_info = DrawInformation(800, 600, lst)
+    min_val, max_val = args.value_range
+    # Every new list is drawn from this, so a --seed run starts from the same lists each time.
+    rng = make_rng(args.seed)
+    if args.load:
+        lst = load_file(args.load)
+        if not lst:
+            print(f"{args.load} holds no values")
+            return
+    else:
+        lst = generate_starting_list(args.size, min_val, max_val, args.shape, rng)
+
+    n = len(lst)  # Initial size of the array
+    size_step = args.size_step  # + and - change the size by this much
+    max_n = max(n, args.max_size)  # + Size stops here
+
+    if args.record:
+        initial = array('q', lst)
+        trace = record_steps(start_sort(ALGORITHMS[args.algorithm], lst, not args.descending))
+        save_trace(args.record, initial, trace, args.algorithm, not args.descending)
+        print(f"Recorded {len(trace)} steps of {args.algorithm} on {n} elements to {args.record}")
+        return
+
+    if args.race:
+        run_race(args.race, lst, not args.descending, args.race_by, args.backing, clock)
+        pygame.quit()
+        return
+
+    if args.external:
+        root, ext = splitext(args.external)
+        external = ExternalSort(args.external, args.output or f"{root}.sorted{ext}", ALGORITHMS[args.algorithm],
+                                not args.descending, args.run_length)
+        if not external.n:
+            print(f"{args.external} holds no values")
+            external.close()
+            return
+        draw_info = DrawInformation(800, 600, external.sample(EXTERNAL_BARS), args.backing)
+        run_external(draw_info, external, args.algorithm, clock)
+        pygame.quit()
+        return
+
+    if args.replay:
+        trace_file = TraceFile(args.replay)
+        draw_info = DrawInformation(800, 600, array('q', trace_file.initial), args.backing)
+        run_replay(draw_info, TracePlayer(trace_file, draw_info.lst), clock)
+        pygame.quit()
+        return
+
+    draw_info = DrawInformation(800, 600, lst, args.backing)
+    preload_sounds()
 
     sorting = False
     ascending = True
 
-    sorting_algorithm = bubble_sort
-    sorting_algo_name = "Bubble Sort"
+    sorting_algorithm = ALGORITHMS["Bubble Sort"]
     sorting_algorithm_generator = None
     sound_enabled = False
+    speed_index = 0
+    stats = None
+    # Starting list, steps, name and direction of the last run, for saving with the W key.
+    recording = None
+    # Where the running sort goes in the result cache once it finishes; None when it was replayed from there.
+    cache_key = None
+    # The selected search and the last one started on the sorted list.
+    search_names = list(SEARCHES)
+    search_name = "Binary Search"
+    search = None
+    perf = FrameTimer(args.perf_log)
+    draw_info.perf = perf
+    draw_info.show_perf = args.perf
     # Selection window qualities
     window = draw_info.window
     buttons = [
@@ -363,34 +1547,24 @@ def main():
     ]
     input_method = None
     # Defining the mouse window.
-    mouse_buttons = [
-        {'rect': pygame.Rect(10, 60, 120, 30), 'text': "Bubble Sort", 'color': draw_info.LF_COLOR,
-         'action': 'bubble_sort'},
-        {'rect': pygame.Rect(140, 60, 120, 30), 'text': "Insertion Sort", 'color': draw_info.LF_COLOR,
-         'action': 'insertion_sort'},
-        {'rect': pygame.Rect(270, 60, 120, 30), 'text': "Selection Sort", 'color': draw_info.LF_COLOR,
-         'action': 'selection_sort'},
-        {'rect': pygame.Rect(400, 60, 120, 30), 'text': "Merge Sort", 'color': draw_info.LF_COLOR,
-         'action': 'merge_sort'},
-        {'rect': pygame.Rect(530, 60, 120, 30), 'text': "Quick Sort", 'color': draw_info.LF_COLOR,
-         'action': 'quick_sort'},
-        {'rect': pygame.Rect(660, 60, 120, 30), 'text': "Shaker Sort", 'color': draw_info.LF_COLOR,
-         'action': 'cocktail_shaker_sort'},
-        {'rect': pygame.Rect(10, 100, 120, 30), 'text': "Heap Sort", 'color': draw_info.LF_COLOR,
-         'action': 'heap_sort'},
-        {'rect': pygame.Rect(140, 100, 120, 30), 'text': "Ascending", 'color': draw_info.LF_COLOR,
-         'action': 'ascending'},
-        {'rect': pygame.Rect(270, 100, 120, 30), 'text': "Descending", 'color': draw_info.LF_COLOR,
-         'action': 'descending'},
-        {'rect': pygame.Rect(400, 100, 120, 30), 'text': "New List", 'color': draw_info.LF_COLOR, 'action': 'new_list'},
-        {'rect': pygame.Rect(530, 100, 120, 30), 'text': "+ Size", 'color': draw_info.LF_COLOR,
-         'action': 'increase_size'},
-        {'rect': pygame.Rect(660, 100, 120, 30), 'text': "- Size", 'color': draw_info.LF_COLOR,
-         'action': 'decrease_size'},
+    mouse_buttons = []
+    # One button per registered algorithm, then the controls.
+    button_labels = [(algorithm.label, 'sort', algorithm) for algorithm in ALGORITHMS.values()] + [
+        ("Ascending", 'ascending', None), ("Descending", 'descending', None), ("New List", 'new_list', None),
+        ("+ Size", 'increase_size', None), ("- Size", 'decrease_size', None), ("Search", 'search', None),
+        ("Next Search", 'next_search', None), ("Restore List", 'restore_list', None),
     ]
+    # Rows of seven between the title and the status line.
+    for k, (text, action, algorithm) in enumerate(button_labels):
+        mouse_buttons.append({'rect': pygame.Rect(10 + k % 7 * 112, 46 + k // 7 * 21, 106, 19), 'text': text,
+                              'color': draw_info.LF_COLOR, 'action': action, 'algorithm': algorithm})
+    # Keyboard mode picks an algorithm by its registered key.
+    algorithm_keys = {getattr(pygame, f"K_{algorithm.key}"): algorithm for algorithm in ALGORITHMS.values()
+                      if algorithm.key}
 
     while run:
         clock.tick(60)
+        perf.begin(draw_info.step_count)
 
         if input_method is None:
             draw_initial_selection_screen(window, draw_info.width, draw_info.height, buttons)
@@ -407,74 +1581,126 @@ def main():
 
             continue
 
+        # A search's query rates are measured a slice per frame, alongside its animation.
+        if search is not None:
+            search.measure()
+            perf.lap("algorithm")
+
         if sorting:
-            try:
-                next(sorting_algorithm_generator)
-            except StopIteration:
+            trace = recording[1] if cache_key is not None else None
+            last_step, finished = advance_sort(draw_info, sorting_algorithm_generator, SPEEDS[speed_index],
+                                               trace=trace, trace_limit=result_cache.max_bytes)
+            perf.lap("algorithm")
+            # Steps past what the result cache could hold are not kept; the run is cached with its result only.
+            if trace is not None and trace.nbytes() > result_cache.max_bytes:
+                recording = (recording[0], None, *recording[2:])
+            if last_step is not None:
+                draw_list_incremental(draw_info, step_colors(draw_info, last_step))
+            if draw_info.hud_text != hud_line(stats, SPEEDS[speed_index]):
+                draw_hud(draw_info, hud_line(stats, SPEEDS[speed_index]))
+            if finished:
                 sorting = False
+                if cache_key is not None:
+                    result_cache.put(cache_key, draw_info.lst, recording[1], stats.counts, stats.max_depth)
+                    cache_key = None
                 if sound_enabled:
-                    pygame.mixer.music.stop()
+                    stop_sorting_sound()
                     sound_enabled = False
+        elif search is not None and search.generator is not None:
+            # Searches only compare, so their probes are what the speed setting paces.
+            last_step, finished = advance_sort(draw_info, search.generator, SPEEDS[speed_index],
+                                               paced=(STEP_COMPARE,))
+            perf.lap("algorithm")
+            if last_step is not None:
+                if last_step[0] == STEP_DONE:
+                    search.found = last_step[1]
+                draw_list_incremental(draw_info, step_colors(draw_info, last_step))
+            if finished:
+                search.generator = None
+            if draw_info.hud_text != hud_line(stats, SPEEDS[speed_index], search):
+                draw_hud(draw_info, hud_line(stats, SPEEDS[speed_index], search))
         else:
+            title = sorting_algorithm.name if search is None else search.name
+            highlight = {} if search is None else search.highlight(draw_info)
             if input_method == 'Keyboard':
-                draw(draw_info, sorting_algo_name, ascending, [], show_controls=True)
+                draw(draw_info, title, ascending, [], show_controls=True,
+                     hud_text=hud_line(stats, SPEEDS[speed_index], search), highlight=highlight)
             else:
-                draw(draw_info, sorting_algo_name, ascending, mouse_buttons)
+                draw(draw_info, title, ascending, mouse_buttons,
+                     hud_text=hud_line(stats, SPEEDS[speed_index], search), highlight=highlight)
+        perf.lap("render")
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
 
+            # Speed keys work in both input modes and can be changed while sorting.
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_RIGHT:
+                    speed_index = min(speed_index + 1, len(SPEEDS) - 1)
+                elif event.key == pygame.K_LEFT:
+                    speed_index = max(speed_index - 1, 0)
+                elif event.key == pygame.K_f:
+                    speed_index = len(SPEEDS) - 1
+                elif event.key == pygame.K_F3:
+                    draw_info.show_perf = not draw_info.show_perf
+                    draw_info.drawn = None  # repaint the bars the overlay covered
+                elif event.key == pygame.K_e and stats is not None:
+                    stats.export(STATS_FILE)
+                    print(f"Saved {sorting_algorithm.name} statistics to {STATS_FILE}")
+                elif event.key == pygame.K_w and recording is not None and not sorting:
+                    if recording[1] is None:
+                        print(f"{recording[2]} took too many steps to record")
+                    else:
+                        save_trace(TRACE_FILE, *recording)
+                        print(f"Saved {recording[2]} trace to {TRACE_FILE}")
+
             if input_method == 'Keyboard':
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_r:
-                        lst = generate_starting_list(n, min_val, max_val)
+                        lst = generate_starting_list(n, min_val, max_val, args.shape, rng)
                         draw_info.set_list(lst)
                         sorting = False
+                        stats = None
+                        search = None
                         if sound_enabled:
-                            pygame.mixer.music.stop()
+                            stop_sorting_sound()
                             sound_enabled = False
                     elif event.key == pygame.K_SPACE and not sorting:
                         sorting = True
-                        if sorting_algorithm == merge_sort:
-                            sorting_algorithm_generator = sorting_algorithm(draw_info, 0, len(lst) - 1, ascending)
-                        else:
-                            sorting_algorithm_generator = sorting_algorithm(draw_info, ascending)
+                        search = None
+                        draw_info.search_index = None
+                        stats, sorting_algorithm_generator, recording, cache_key = start_run(
+                            draw_info, sorting_algorithm, ascending, SPEEDS[speed_index] is None)
                         if not sound_enabled:
-                            sound_enabled = play_sorting_sound(sorting_algo_name)
+                            sound_enabled = play_sorting_sound(sorting_algorithm.name)
                     elif event.key == pygame.K_a and not sorting:
                         ascending = True
                     elif event.key == pygame.K_d and not sorting:
                         ascending = False
-                    elif event.key == pygame.K_i and not sorting:
-                        sorting_algorithm = insertion_sort
-                        sorting_algo_name = "Insertion Sort"
-                    elif event.key == pygame.K_b and not sorting:
-                        sorting_algorithm = bubble_sort
-                        sorting_algo_name = "Bubble Sort"
-                    elif event.key == pygame.K_s and not sorting:
-                        sorting_algorithm = selection_sort
-                        sorting_algo_name = "Selection Sort"
-                    elif event.key == pygame.K_m and not sorting:
-                        sorting_algorithm = merge_sort
-                        sorting_algo_name = "Merge Sort"
-                    elif event.key == pygame.K_q and not sorting:
-                        sorting_algorithm = quick_sort
-                        sorting_algo_name = "Quick Sort"
-                    elif event.key == pygame.K_x and not sorting:
-                        sorting_algorithm = cocktail_shaker_sort
-                        sorting_algo_name = "Cocktail Shaker Sort"
-                    elif event.key == pygame.K_h and not sorting:
-                        sorting_algorithm = heap_sort
-                        sorting_algo_name = "Heap Sort"
+                    elif event.key in algorithm_keys and not sorting:
+                        sorting_algorithm = algorithm_keys[event.key]
+                    elif event.key == pygame.K_u and not sorting and recording is not None:
+                        # Back to the list the last run started from, so a rerun on it comes from the cache.
+                        n = len(recording[0])
+                        draw_info.set_list(list(recording[0]))
+                        stats = None
+                        search = None
+                    elif event.key == pygame.K_k and not sorting:
+                        search = start_search(draw_info, search_name)
+                    elif event.key == pygame.K_TAB and not sorting:
+                        search_name = search_names[(search_names.index(search_name) + 1) % len(search_names)]
+                        search = start_search(draw_info, search_name)
                     elif event.key == pygame.K_PLUS or event.key == pygame.K_EQUALS and not sorting:  # `+` or `=`
-                        n = min(n + 10, 100)  # Cap the size at 100
-                        lst = generate_starting_list(n, min_val, max_val)
+                        n = min(n + size_step, max_n)  # Cap the size at max_n
+                        lst = generate_starting_list(n, min_val, max_val, args.shape, rng)
                         draw_info.set_list(lst)
+                        search = None
                     elif event.key == pygame.K_MINUS and not sorting:
-                        n = max(n - 10, 10)  # Minimum size of 10
-                        lst = generate_starting_list(n, min_val, max_val)
+                        n = max(n - size_step, size_step)  # Minimum size of one step
+                        lst = generate_starting_list(n, min_val, max_val, args.shape, rng)
                         draw_info.set_list(lst)
+                        search = None
 
             elif input_method == 'Mouse':
                 if event.type == pygame.MOUSEBUTTONDOWN:
@@ -488,39 +1714,63 @@ def main():
                             elif action == 'descending':
                                 ascending = False
                             elif action == 'new_list':
-                                lst = generate_starting_list(n, min_val, max_val)
+                                lst = generate_starting_list(n, min_val, max_val, args.shape, rng)
                                 draw_info.set_list(lst)
                                 sorting = False
+                                stats = None
+                                search = None
                                 if sound_enabled:
-                                    pygame.mixer.music.stop()
+                                    stop_sorting_sound()
                                     sound_enabled = False
                             elif action == 'increase_size':
-                                n = min(n + 10, 100)  # Cap the size at 100
-                                lst = generate_starting_list(n, min_val, max_val)
+                                n = min(n + size_step, max_n)  # Cap the size at max_n
+                                lst = generate_starting_list(n, min_val, max_val, args.shape, rng)
                                 draw_info.set_list(lst)
                                 sorting = False
+                                search = None
                             elif action == 'decrease_size':
-                                n = max(n - 10, 10)  # Minimum size of 10
-                                lst = generate_starting_list(n, min_val, max_val)
+                                n = max(n - size_step, size_step)  # Minimum size of one step
+                                lst = generate_starting_list(n, min_val, max_val, args.shape, rng)
                                 draw_info.set_list(lst)
                                 sorting = False
-                            else:
-                                sorting_algorithm = globals()[action]
-                                sorting_algo_name = button['text']
-
-                                if action == 'merge_sort':
-                                    sorting_algorithm_generator = sorting_algorithm(draw_info, 0, len(lst) - 1,
-                                                                                    ascending)
-                                else:
-                                    sorting_algorithm_generator = sorting_algorithm(draw_info, ascending)
+                                search = None
+                            elif action == 'restore_list':
+                                if not sorting and recording is not None:
+                                    n = len(recording[0])
+                                    draw_info.set_list(list(recording[0]))
+                                    stats = None
+                                    search = None
+                            elif action == 'search':
+                                if not sorting:
+                                    search = start_search(draw_info, search_name)
+                            elif action == 'next_search':
+                                search_name = search_names[(search_names.index(search_name) + 1) % len(search_names)]
+                                if not sorting:
+                                    search = start_search(draw_info, search_name)
+                            elif action == 'sort':
+                                sorting_algorithm = button['algorithm']
+
+                                search = None
+                                draw_info.search_index = None
+                                stats, sorting_algorithm_generator, recording, cache_key = start_run(
+                                    draw_info, sorting_algorithm, ascending, SPEEDS[speed_index] is None)
+                                # Only the bars are redrawn while sorting, so the new title goes up now.
+                                draw(draw_info, sorting_algorithm.name, ascending, mouse_buttons,
+                                     hud_text=hud_line(stats, SPEEDS[speed_index]))
 
                                 sorting = True
                                 if not sound_enabled:
-                                    print(f"Attempting to play sound for {sorting_algo_name}")
-                                    sound_enabled = play_sorting_sound(sorting_algo_name)
+                                    print(f"Attempting to play sound for {sorting_algorithm.name}")
+                                    sound_enabled = play_sorting_sound(sorting_algorithm.name)
+        perf.lap("events")
 
-        pygame.display.update()
+        # Every drawing function above has put what it changed on the screen along with the overlay. A frame that
+        # changed nothing still pushes the overlay, so its numbers keep moving.
+        if draw_info.show_perf and not perf.flips:
+            update_display(draw_info, [])
+            perf.lap("render")
 
+    perf.close()
     pygame.quit()
 
 